@@ -5,3 +5,16 @@ sys.path.insert(0, os.path.abspath(
     os.path.join(os.path.dirname(__file__), '..')))
 
 import tmc_http_server.tmc_http_server as tmc_server
+import tmc_http_server.files as tmc_files
+import tmc_http_server.batch as tmc_batch
+import tmc_http_server.background as tmc_background
+import tmc_http_server.access_log as tmc_access_log
+import tmc_http_server.profiler as tmc_profiler
+import tmc_http_server.memory as tmc_memory
+import tmc_http_server.testing as tmc_testing
+import tmc_http_server.health as tmc_health
+import tmc_http_server.timeseries as tmc_timeseries
+import tmc_http_server.bulkhead as tmc_bulkhead
+import tmc_http_server.encoding as tmc_encoding
+import tmc_http_server.tracing as tmc_tracing
+import tmc_http_server.heartbeat as tmc_heartbeat
@@ -0,0 +1,94 @@
+import io
+import json
+
+from unittest.mock import MagicMock
+
+from .context import tmc_server, tmc_access_log
+
+
+class TestAccessLogger:
+    def test_json_lines(self):
+        stream = io.StringIO()
+        logger = tmc_access_log.TMCAccessLogger(stream=stream)
+        logger.log("127.0.0.1", "GET", "/foo?password=bar", 200, 0.002)
+        logger.stop(1.0)
+
+        record = json.loads(stream.getvalue())
+        assert record["path"] == "/foo"
+        assert record["status"] == 200
+        assert record["duration_ms"] == 2.0
+
+    def test_recent(self):
+        logger = tmc_access_log.TMCAccessLogger(ring_size=3)
+        for status in (200, 404, 200, 500):
+            logger.log("127.0.0.1", "GET", "/foo", status, 0.0)
+
+        logger.stop(1.0)
+        assert [r["status"] for r in logger.recent()] == [404, 200, 500]
+        assert [r["status"] for r in logger.recent(limit=1)] == [500]
+        assert len(logger.recent(status=200)) == 1
+
+    def test_sampling_keeps_errors(self):
+        logger = tmc_access_log.TMCAccessLogger(sample_rate=0.0)
+        logger.log("127.0.0.1", "GET", "/foo", 200, 0.0)
+        logger.log("127.0.0.1", "GET", "/foo", 500, 0.0)
+        logger.stop(1.0)
+        assert [r["status"] for r in logger.recent()] == [500]
+
+
+class TestAccessLogRoute:
+    def make_client(self):
+        logger = tmc_access_log.TMCAccessLogger(interval=0.01)
+        server = tmc_server.TMCServer(access_logger=logger)
+        server.add_url_handle("/foo", lambda: "foo")
+        server.enable_access_log_route()
+        return logger, server.test_client()
+
+    def test_requests_are_logged(self):
+        logger, client = self.make_client()
+        client.get("/foo")
+        client.get("/missing")
+        logger.stop(1.0)
+
+        records = logger.recent()
+        assert [(r["path"], r["status"]) for r in records] == [
+            ("/foo", 200),
+            ("/missing", 404),
+        ]
+
+    def test_sink_errors_go_to_server_on_error(self):
+        on_error = MagicMock()
+        logger = tmc_access_log.TMCAccessLogger(
+            sink=MagicMock(side_effect=OSError("disk full")),
+        )
+
+        server = tmc_server.TMCServer(on_error=on_error, access_logger=logger)
+        server.add_url_handle("/foo", lambda: "foo")
+        server.test_client().get("/foo")
+        logger.stop(1.0)
+
+        (err,), _ = on_error.call_args
+        assert isinstance(err, OSError)
+
+    def test_route(self):
+        logger, client = self.make_client()
+        client.get("/foo")
+        client.get("/missing")
+        client.get("/foo")
+        logger.drain.flush()
+
+        resp = client.get("/_access_log", params={"status": 200, "limit": 1})
+        assert resp.status_code == 200
+        assert resp.headers["Content-Type"] == "application/json"
+        assert [r["status"] for r in resp.json()] == [200]
+        assert len(client.get("/_access_log").json()) == 3
+        logger.stop(1.0)
+
+    def test_route_rejects_bad_parameters(self):
+        logger, client = self.make_client()
+        for params in ({"limit": "abc"}, {"limit": -1}, {"status": 42}):
+            resp = client.get("/_access_log", params=params)
+            assert resp.status_code == 400
+            assert "error" in resp.json()
+
+        logger.stop(1.0)
@@ -0,0 +1,73 @@
+import time
+import threading
+
+from unittest.mock import MagicMock
+
+from .context import tmc_background
+
+
+class TestDrain:
+    def test_drains_in_order(self):
+        received = []
+        drain = tmc_background.TMCDrain(received.extend, interval=0.01)
+        for i in range(100):
+            drain.put(i)
+
+        drain.stop(1.0)
+        assert received == list(range(100))
+
+    def test_put_does_not_wait_on_slow_sink(self):
+        release = threading.Event()
+        drain = tmc_background.TMCDrain(
+            lambda items: release.wait(),
+            capacity=10,
+            interval=0.01,
+        )
+
+        drain.put(0)
+        time.sleep(0.05)  # Let the background thread block in the sink.
+        started = time.perf_counter()
+        for i in range(1000):
+            drain.put(i)
+
+        elapsed = time.perf_counter() - started
+        release.set()
+        drain.stop(1.0)
+        assert elapsed < 0.1
+        assert drain.dropped == 990
+
+    def test_sink_errors_are_reported(self):
+        on_error = MagicMock()
+
+        def sink(items):
+            raise ValueError("broken")
+
+        drain = tmc_background.TMCDrain(sink, on_error=on_error)
+        drain.put(1)
+        drain.stop(1.0)
+        assert on_error.call_count == 1
+
+
+class TestIntervalThread:
+    def test_ticks_until_stopped(self):
+        ticks = []
+        worker = tmc_background.TMCIntervalThread(
+            lambda: ticks.append(1),
+            0.01,
+            "tick",
+            final=True,
+        )
+
+        worker.start().start()
+        assert worker.running
+        time.sleep(0.05)
+        worker.stop(1.0)
+        count = len(ticks)
+        time.sleep(0.03)
+
+        assert not worker.running
+        assert count >= 2
+        assert len(ticks) == count
+
+        worker.start().stop(1.0)
+        assert len(ticks) > count
@@ -0,0 +1,78 @@
+from unittest.mock import MagicMock
+
+from .context import tmc_server, tmc_batch
+
+
+def make_rules():
+    def forbidden(username, password):
+        return False
+
+    def broken():
+        raise ValueError("broken")
+
+    return {
+        "/foo, GET": tmc_server.TMCKnownRoute(
+            lambda bar=None: "foo{}".format(bar or ""), tmc_server.yes),
+        "/foo, POST": tmc_server.TMCKnownRoute(
+            lambda: "posted", tmc_server.yes),
+        "/secret, GET": tmc_server.TMCKnownRoute(lambda: "secret", forbidden),
+        "/broken, GET": tmc_server.TMCKnownRoute(broken, tmc_server.yes),
+    }
+
+
+class TestBatch:
+    def test_execute_in_order(self):
+        batch = tmc_batch.TMCBatch(10, 2, MagicMock())
+        results = batch.execute(make_rules(), [
+            {"route": "/foo"},
+            {"route": "/foo", "params": {"bar": 3}},
+            {"route": "/foo", "method": "POST"},
+        ], "", "")
+
+        assert [r["body"] for r in results] == ["foo", "foo3", "posted"]
+        assert all(r["status"] == 200 for r in results)
+
+    def test_sub_request_errors(self):
+        on_error = MagicMock()
+        batch = tmc_batch.TMCBatch(10, 2, on_error)
+        results = batch.execute(make_rules(), [
+            {"route": "/missing"},
+            {"route": "/secret"},
+            {"route": "/broken"},
+            {"method": "GET"},
+            {"route": "/foo", "params": [1, 2]},
+            "/foo",
+        ], "", "")
+
+        statuses = [r["status"] for r in results]
+        assert statuses == [404, 503, 500, 400, 400, 400]
+        assert on_error.call_count == 1
+
+    def test_sub_requests_are_authorized(self):
+        authorize = MagicMock(return_value=True)
+        rules = {
+            "/foo, GET": tmc_server.TMCKnownRoute(lambda: "foo", authorize),
+        }
+
+        batch = tmc_batch.TMCBatch(10, 2, MagicMock())
+        batch.execute(rules, [{"route": "/foo"}], "user", "pass")
+        authorize.assert_called_once_with("user", "pass")
+
+    def test_structured_results_are_embedded(self):
+        server = tmc_server.TMCServer()
+        server.add_url_handle("/stats", lambda: {"threads": 3})
+        server.add_url_handle(
+            "/teapot",
+            lambda: tmc_server.TMCResponse(["short", "stout"], 418),
+        )
+
+        server.enable_batch()
+        resp = server.test_client().post("/_batch", json=[
+            {"route": "/stats"},
+            {"route": "/teapot"},
+        ])
+
+        assert resp.json() == [
+            {"status": 200, "body": {"threads": 3}},
+            {"status": 418, "body": ["short", "stout"]},
+        ]
@@ -0,0 +1,117 @@
+import threading
+
+from unittest.mock import MagicMock
+
+from .context import tmc_server, tmc_bulkhead, tmc_batch
+
+
+def hold(bulkhead, release):
+    """Occupies a slot of the bulkhead until release is set."""
+
+    acquired = threading.Event()
+
+    def occupy():
+        with bulkhead:
+            acquired.set()
+            release.wait(2.0)
+
+    thread = threading.Thread(target=occupy)
+    thread.start()
+    acquired.wait(2.0)
+    return thread
+
+
+class TestBulkhead:
+    def test_rejects_when_full(self):
+        bulkhead = tmc_bulkhead.TMCBulkhead("/slow", 1)
+        release = threading.Event()
+        thread = hold(bulkhead, release)
+
+        assert not bulkhead.acquire()
+        assert bulkhead.stats()["in_flight"] == 1
+        assert bulkhead.stats()["rejected"] == 1
+
+        release.set()
+        thread.join()
+        assert bulkhead.acquire()
+        bulkhead.release()
+        assert bulkhead.stats()["completed"] == 2
+
+    def test_queues_until_slot_is_free(self):
+        bulkhead = tmc_bulkhead.TMCBulkhead("/slow", 1, queue_timeout=2.0)
+        release = threading.Event()
+        thread = hold(bulkhead, release)
+        threading.Timer(0.05, release.set).start()
+
+        assert bulkhead.acquire()
+        bulkhead.release()
+        thread.join()
+        assert bulkhead.stats()["rejected"] == 0
+
+    def test_queue_timeout_and_limit(self):
+        bulkhead = tmc_bulkhead.TMCBulkhead(
+            "/slow", 1, queue_timeout=0.05, max_queue=0)
+        release = threading.Event()
+        thread = hold(bulkhead, release)
+        assert not bulkhead.acquire()
+
+        bulkhead.max_queue = None
+        assert not bulkhead.acquire()
+        assert bulkhead.stats()["waiting"] == 0
+        assert bulkhead.stats()["rejected"] == 2
+
+        release.set()
+        thread.join()
+
+
+class TestServerBulkheads:
+    def test_full_route_returns_503(self):
+        server = tmc_server.TMCServer()
+        release = threading.Event()
+        entered = threading.Event()
+
+        @server.route("/slow", max_concurrency=1)
+        def slow():
+            entered.set()
+            release.wait(2.0)
+            return "slow"
+
+        @server.route("/live")
+        def live():
+            return "ok"
+
+        server.enable_bulkhead_route()
+        client = server.test_client()
+        thread = threading.Thread(target=client.get, args=("/slow",))
+        thread.start()
+        entered.wait(2.0)
+
+        busy = client.get("/slow")
+        assert busy.status_code == 503
+        assert busy.headers["Retry-After"] == "1"
+        assert client.get("/live").text == "ok"
+
+        stats = client.get("/_bulkheads").json()
+        assert stats["/slow"]["in_flight"] == 1
+        assert stats["/slow"]["rejected"] == 1
+        assert "/live" not in stats
+
+        release.set()
+        thread.join()
+        assert client.get("/slow").text == "slow"
+
+    def test_batch_respects_bulkhead(self):
+        bulkhead = tmc_bulkhead.TMCBulkhead("/slow", 1)
+        rules = {
+            "/slow, GET": tmc_server.TMCKnownRoute(
+                lambda: "slow", tmc_server.yes, bulkhead),
+        }
+
+        release = threading.Event()
+        thread = hold(bulkhead, release)
+        batch = tmc_batch.TMCBatch(10, 2, MagicMock())
+        results = batch.execute(rules, [{"route": "/slow"}], "", "")
+        release.set()
+        thread.join()
+
+        assert results == [{"status": 503, "body": "Busy"}]
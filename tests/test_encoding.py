@@ -0,0 +1,150 @@
+import json
+import datetime
+
+import pytest
+
+from .context import tmc_server, tmc_encoding
+
+
+class TestNegotiate:
+    def test_defaults_to_json(self):
+        assert tmc_encoding.negotiate(None) == tmc_encoding.JSON
+        assert tmc_encoding.negotiate("*/*") == tmc_encoding.JSON
+        assert tmc_encoding.negotiate("text/html") == tmc_encoding.JSON
+
+    def test_parse_accept(self):
+        assert tmc_encoding.parse_accept(
+            "application/cbor;q=0.5, Application/JSON, */*;q=x"
+        ) == [
+            ("application/cbor", 0.5),
+            ("application/json", 1.0),
+            ("*/*", 0.0),
+        ]
+
+    def test_prefers_highest_quality(self):
+        pytest.importorskip("msgpack")
+        pytest.importorskip("cbor2")
+        accept = "application/json;q=0.5, application/x-msgpack"
+        assert tmc_encoding.negotiate(accept) == tmc_encoding.MSGPACK
+        accept = "application/*;q=0.2, application/cbor;q=0.9"
+        assert tmc_encoding.negotiate(accept) == tmc_encoding.CBOR
+        accept = "application/cbor;q=0, */*"
+        assert tmc_encoding.negotiate(accept) == tmc_encoding.JSON
+
+    def test_skips_unavailable_codecs(self, monkeypatch):
+        monkeypatch.setitem(tmc_encoding._CODECS, "msgpack", None)
+        accept = "application/msgpack, application/json;q=0.1"
+        assert tmc_encoding.negotiate(accept) == tmc_encoding.JSON
+
+
+class TestEncode:
+    def test_json_numpy(self):
+        numpy = pytest.importorskip("numpy")
+        body, media_type = tmc_encoding.encode({
+            "values": numpy.arange(3),
+            "mean": numpy.float64(1.5),
+        })
+
+        assert media_type == tmc_encoding.JSON
+        assert json.loads(body) == {"values": [0, 1, 2], "mean": 1.5}
+
+    def test_unknown_types_fall_back_to_str(self):
+        when = datetime.datetime(2024, 1, 2, 3, 4, 5)
+        value = {"when": when, "tags": {"a"}}
+        body, _ = tmc_encoding.encode(value)
+        assert json.loads(body) == {"when": str(when), "tags": "{'a'}"}
+
+        msgpack = pytest.importorskip("msgpack")
+        body, _ = tmc_encoding.encode(value, "application/msgpack")
+        assert msgpack.unpackb(body)["when"] == str(when)
+
+        cbor2 = pytest.importorskip("cbor2")
+        body, _ = tmc_encoding.encode(
+            {"when": when, "obj": object},
+            "application/cbor",
+        )
+
+        decoded = cbor2.loads(body)
+        assert decoded["when"] == when.replace(tzinfo=datetime.timezone.utc)
+        assert decoded["obj"] == str(object)
+
+    def test_msgpack_numpy_buffer(self):
+        numpy = pytest.importorskip("numpy")
+        msgpack = pytest.importorskip("msgpack")
+        values = numpy.arange(6, dtype="<f4").reshape(2, 3)
+        body, media_type = tmc_encoding.encode(
+            {"values": values},
+            "application/msgpack",
+        )
+
+        assert media_type == tmc_encoding.MSGPACK
+        decoded = msgpack.unpackb(body)["values"]
+        assert decoded["dtype"] == "<f4"
+        assert decoded["shape"] == [2, 3]
+        assert decoded["data"] == values.tobytes()
+
+    def test_cbor_typed_array(self):
+        numpy = pytest.importorskip("numpy")
+        cbor2 = pytest.importorskip("cbor2")
+        values = numpy.arange(4, dtype="<i2")
+        body, media_type = tmc_encoding.encode([values], "application/cbor")
+
+        assert media_type == tmc_encoding.CBOR
+        tag = cbor2.loads(body)[0]
+        assert tag.tag == 40
+        shape, typed = tag.value
+        assert list(shape) == [4]
+        assert typed.tag == 77  # sint16, little endian.
+        assert typed.value == values.tobytes()
+
+    def test_typed_array_tags(self):
+        numpy = pytest.importorskip("numpy")
+        tags = {
+            "u1": 64, "i1": 72, ">u4": 66, "<u8": 71,
+            ">f2": 80, ">f8": 82, "<f4": 85, "<f8": 86,
+        }
+
+        for dtype, tag in tags.items():
+            assert tmc_encoding.typed_array_tag(numpy.dtype(dtype)) == tag
+
+        assert tmc_encoding.typed_array_tag(numpy.dtype("c16")) is None
+
+
+class TestSendResult:
+    def test_negotiates_structured_results(self):
+        msgpack = pytest.importorskip("msgpack")
+        server = tmc_server.TMCServer()
+
+        @server.route("/stats")
+        def stats():
+            return {"threads": 3}
+
+        @server.route("/text")
+        def text():
+            return "plain"
+
+        client = server.test_client()
+        resp = client.get("/stats")
+        assert resp.headers["Content-Type"] == "application/json"
+        assert resp.json() == {"threads": 3}
+
+        resp = client.get(
+            "/stats",
+            headers={"Accept": "application/msgpack"},
+        )
+
+        assert resp.headers["Content-Type"] == "application/msgpack"
+        assert resp.headers["Vary"] == "Accept"
+        assert msgpack.unpackb(resp.data) == {"threads": 3}
+
+        resp = client.get("/text", headers={"Accept": "application/msgpack"})
+        assert resp.text == "plain"
+
+    def test_unknown_types_dont_fail_the_request(self):
+        server = tmc_server.TMCServer()
+        when = datetime.datetime(2024, 1, 2, 3, 4, 5)
+        server.add_url_handle("/when", lambda: {"when": when})
+
+        resp = server.test_client().get("/when")
+        assert resp.status_code == 200
+        assert resp.json() == {"when": str(when)}
@@ -0,0 +1,92 @@
+import os
+import socket
+import threading
+
+import pytest
+
+from .context import tmc_files
+
+
+class TestParseRange:
+    def test_no_header(self):
+        assert tmc_files.parse_range(None, 100) is None
+        assert tmc_files.parse_range("", 100) is None
+
+    def test_closed_range(self):
+        assert tmc_files.parse_range("bytes=0-9", 100) == (0, 9)
+        assert tmc_files.parse_range("bytes=90-200", 100) == (90, 99)
+
+    def test_open_range(self):
+        assert tmc_files.parse_range("bytes=10-", 100) == (10, 99)
+
+    def test_suffix_range(self):
+        assert tmc_files.parse_range("bytes=-10", 100) == (90, 99)
+        assert tmc_files.parse_range("bytes=-1000", 100) == (0, 99)
+
+    def test_ignores_unsupported(self):
+        assert tmc_files.parse_range("bytes=0-1, 5-6", 100) is None
+        assert tmc_files.parse_range("items=0-1", 100) is None
+        assert tmc_files.parse_range("bytes=9-3", 100) is None
+
+    def test_unsatisfiable(self):
+        with pytest.raises(tmc_files.UnsatisfiableRangeError):
+            tmc_files.parse_range("bytes=100-", 100)
+
+        with pytest.raises(tmc_files.UnsatisfiableRangeError):
+            tmc_files.parse_range("bytes=-5", 0)
+
+
+class TestResolvePath:
+    def test_resolves_file(self, tmp_path):
+        (tmp_path / "app.log").write_text("foo")
+        root = os.path.realpath(str(tmp_path))
+        assert tmc_files.resolve_path(root, "app.log") == os.path.join(
+            root, "app.log")
+
+    def test_rejects_escape(self, tmp_path):
+        root = tmp_path / "root"
+        root.mkdir()
+        (tmp_path / "secret").write_text("foo")
+        (root / "link").symlink_to(tmp_path / "secret")
+        root = os.path.realpath(str(root))
+        assert tmc_files.resolve_path(root, "../secret") is None
+        assert tmc_files.resolve_path(root, "link") is None
+        assert tmc_files.resolve_path(root, str(tmp_path / "secret")) is None
+
+    def test_rejects_directories(self, tmp_path):
+        (tmp_path / "sub").mkdir()
+        root = os.path.realpath(str(tmp_path))
+        assert tmc_files.resolve_path(root, "sub") is None
+        assert tmc_files.resolve_path(root, "") is None
+
+
+class TestSendFile:
+    def _send(self, tmp_path, offset, count, timeout=None):
+        (tmp_path / "app.log").write_bytes(bytes(range(256)) * 1024)
+        server, client = socket.socketpair()
+        server.settimeout(timeout)
+        received = []
+
+        def read():
+            chunk = client.recv(1 << 16)
+            while chunk:
+                received.append(chunk)
+                chunk = client.recv(1 << 16)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        with server, client, open(str(tmp_path / "app.log"), "rb") as f:
+            wfile = server.makefile("wb", buffering=0)
+            tmc_files.send_file(server, wfile, f, offset, count)
+            server.shutdown(socket.SHUT_WR)
+            reader.join(5.0)
+
+        return b"".join(received)
+
+    def test_sendfile(self, tmp_path):
+        data = bytes(range(256)) * 1024
+        assert self._send(tmp_path, 1000, 100000) == data[1000:101000]
+
+    def test_mmap_fallback(self, tmp_path):
+        data = bytes(range(256)) * 1024
+        assert self._send(tmp_path, 1000, 100000, 5.0) == data[1000:101000]
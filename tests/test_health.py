@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import threading
+
+from .context import tmc_server, tmc_health
+
+
+def report(registry):
+    return json.loads(registry.report.body)
+
+
+class TestHealthRegistry:
+    def test_pending_until_run(self):
+        registry = tmc_health.TMCHealthRegistry()
+        registry.register("db", lambda: True)
+        assert registry.report.status == 503
+        assert report(registry)["checks"]["db"]["detail"] == "pending"
+
+        registry.refresh()
+        assert registry.report.status == 200
+        assert report(registry)["status"] == "ok"
+
+    def test_failures(self):
+        def broken():
+            raise ConnectionError("refused")
+
+        registry = tmc_health.TMCHealthRegistry()
+        registry.register("queue", lambda: {"depth": 3})
+        registry.register("cache", lambda: False, critical=False)
+        registry.refresh()
+        assert registry.report.status == 200
+        assert report(registry)["status"] == "degraded"
+        assert report(registry)["checks"]["queue"]["detail"] == {"depth": 3}
+
+        registry.register("db", broken)
+        registry.refresh()
+        result = report(registry)
+        assert registry.report.status == 503
+        assert result["status"] == "failing"
+        assert result["checks"]["db"]["detail"] == "ConnectionError: refused"
+
+    def test_checks_run_concurrently_with_timeouts(self):
+        registry = tmc_health.TMCHealthRegistry()
+        registry.register("slow1", lambda: time.sleep(0.2) or True)
+        registry.register("slow2", lambda: time.sleep(0.2) or True)
+        registry.register("stuck", lambda: time.sleep(1.0), timeout=0.1)
+
+        started = time.perf_counter()
+        registry.refresh(timeout=0.5)
+        assert time.perf_counter() - started < 0.35
+
+        checks = report(registry)["checks"]
+        assert checks["slow1"]["ok"] and checks["slow2"]["ok"]
+        assert checks["stuck"]["detail"] == "timed out after 0.1s"
+
+    def test_route(self):
+        server = tmc_server.TMCServer()
+
+        @server.health_check("db", interval=60.0)
+        def db():
+            return True
+
+        server.enable_health_route()
+        client = server.test_client()
+        assert client.get("/health").status_code == 503
+
+        server.health.refresh()
+        resp = client.get("/health")
+        assert resp.status_code == 200
+        assert resp.headers["Content-Type"] == "application/json"
+        assert resp.json()["checks"]["db"]["ok"]
+
+    def test_stuck_check_doesnt_hold_up_others(self):
+        db_ok = threading.Event()
+        db_ok.set()
+        registry = tmc_health.TMCHealthRegistry()
+        registry.register("stuck", threading.Event().wait, timeout=0.1,
+                          critical=False)
+        registry.register("db", db_ok.is_set, timeout=0.1)
+        registry.refresh()
+        assert report(registry)["checks"]["db"]["ok"]
+
+        db_ok.clear()
+        registry.refresh()
+        checks = report(registry)["checks"]
+        assert registry.report.status == 503
+        assert checks["db"]["ok"] is False
+        assert checks["stuck"]["detail"] == "timed out after 0.1s"
+
+    def test_stuck_check_doesnt_block_exit(self):
+        script = (
+            "import threading\n"
+            "from tmc_http_server.health import TMCHealthRegistry\n"
+            "registry = TMCHealthRegistry().start()\n"
+            "registry.register('stuck', threading.Event().wait, "
+            "timeout=0.1)\n"
+            "registry.refresh()\n"
+            "registry.stop()\n"
+        )
+
+        subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            check=True,
+            timeout=10.0,
+        )
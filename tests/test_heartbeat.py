@@ -0,0 +1,151 @@
+import sys
+import time
+import threading
+
+import pytest
+
+from .context import tmc_server, tmc_heartbeat
+
+
+def run_worker(registry, stop, **opts):
+    """Starts a thread beating in a loop until stop is set."""
+
+    registered = threading.Event()
+
+    def work():
+        heartbeat = registry.register(**opts)
+        registered.set()
+        while not stop.wait(0.001):
+            heartbeat.beat()
+
+    thread = threading.Thread(target=work, name="worker")
+    thread.start()
+    registered.wait(2.0)
+    return thread
+
+
+class TestHeartbeatRegistry:
+    def test_reports_stalled_threads(self):
+        registry = tmc_heartbeat.TMCHeartbeatRegistry()
+        stop = threading.Event()
+        worker = run_worker(registry, stop, stall_after=5.0)
+        registry.register("stuck", stall_after=0.0)
+        time.sleep(0.02)
+
+        report = registry.report()
+        stop.set()
+        worker.join()
+
+        threads = {thread["name"]: thread for thread in report["threads"]}
+        assert report["status"] == "stalled"
+        assert not threads["worker"]["stalled"]
+        assert threads["worker"]["beats"] > 0
+        assert threads["worker"]["alive"]
+        assert threads["stuck"]["stalled"]
+        assert threads["stuck"]["beats"] == 0
+
+    def test_rate_over_window(self):
+        registry = tmc_heartbeat.TMCHeartbeatRegistry(window=0.05)
+        heartbeat = registry.register()
+        assert registry.report()["threads"][0]["rate"] is None
+
+        for _ in range(10):
+            heartbeat.beat()
+
+        time.sleep(0.06)
+        rate = registry.report()["threads"][0]["rate"]
+        assert 0 < rate <= 10 / 0.05
+
+    def test_unregister_frees_slot(self):
+        registry = tmc_heartbeat.TMCHeartbeatRegistry()
+        first = registry.register("first")
+        registry.unregister(first)
+        second = registry.register("second")
+        first.beat()
+
+        assert second.slot == first.slot
+        assert second.count == 0
+        assert [t["name"] for t in registry.report()["threads"]] == ["second"]
+
+        with pytest.raises(AssertionError):
+            registry.unregister(first)
+
+    def test_many_threads_span_pages(self):
+        registry = tmc_heartbeat.TMCHeartbeatRegistry()
+        heartbeats = [
+            registry.register("t{}".format(i))
+            for i in range(tmc_heartbeat.PAGE_SIZE + 10)
+        ]
+
+        for heartbeat in heartbeats[::100]:
+            heartbeat.beat()
+
+        beats = [t["beats"] for t in registry.report()["threads"]]
+        assert len(beats) == tmc_heartbeat.PAGE_SIZE + 10
+        assert sum(beats) == len(heartbeats[::100])
+
+    def test_beat_registers_calling_thread(self):
+        registry = tmc_heartbeat.TMCHeartbeatRegistry()
+        registry.beat()
+        registry.beat()
+
+        thread, = registry.report()["threads"]
+        assert thread["name"] == threading.current_thread().name
+        assert thread["beats"] == 2
+
+
+class TestHeartbeatRoute:
+    def test_route(self):
+        server = tmc_server.TMCServer()
+        server.enable_heartbeat_route()
+        client = server.test_client()
+        server.heartbeats.register("worker", stall_after=60.0).beat()
+
+        resp = client.get("/_heartbeats")
+        assert resp.status_code == 200
+        assert resp.json()["threads"][0]["name"] == "worker"
+
+        server.heartbeats.register("stuck", stall_after=0.0)
+        time.sleep(0.01)
+        assert client.get("/_heartbeats").status_code == 503
+
+
+class TestHeartbeatRace:
+    def test_unregister_while_beating(self):
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            registry = tmc_heartbeat.TMCHeartbeatRegistry()
+            stop = threading.Event()
+            errors = []
+            registered = threading.Event()
+            handle = []
+
+            def work():
+                handle.append(registry.register("worker"))
+                registered.set()
+                try:
+                    while not stop.is_set():
+                        handle[0].beat()
+                except Exception as err:
+                    errors.append(err)
+
+            worker = threading.Thread(target=work)
+            worker.start()
+            registered.wait(2.0)
+            time.sleep(0.01)
+            registry.unregister(handle[0])
+
+            # Not reused while a beat may still be in flight, and once
+            # reused the old owner's beats never reach the new one.
+            time.sleep(0.01)
+            second = registry.register("second")
+            time.sleep(0.01)
+            stop.set()
+            worker.join()
+
+        finally:
+            sys.setswitchinterval(interval)
+
+        assert errors == []
+        assert second.count == 0
@@ -0,0 +1,148 @@
+import threading
+
+import pytest
+
+from .context import tmc_server, tmc_memory
+
+
+@pytest.fixture
+def profiler():
+    profiler = tmc_memory.TMCMemoryProfiler(max_snapshots=2)
+    profiler.start()
+    yield profiler
+    profiler.stop()
+
+
+class TestMemoryProfiler:
+    def test_diff(self, profiler):
+        profiler.take_snapshot("before")
+        leak = [bytearray(1000) for _ in range(1000)]
+        profiler.take_snapshot("after")
+
+        job = profiler.submit(profiler.diff, "before", "after", 5, "lineno")
+        stats = profiler.result(job, 10.0)
+        assert stats[0]["file"] == __file__
+        assert stats[0]["size_diff"] >= 1000 * 1000
+        assert len(leak) == 1000
+
+    def test_top_by_traceback(self, profiler):
+        profiler.take_snapshot("now")
+        stats = profiler.top("now", 3, "traceback")
+        assert len(stats) == 3
+        assert all(stat["traceback"] for stat in stats)
+
+    def test_evicts_oldest_snapshot(self, profiler):
+        for name in ("a", "b", "c"):
+            profiler.take_snapshot(name)
+
+        assert profiler.snapshots == ["b", "c"]
+        with pytest.raises(tmc_memory.UnknownSnapshotError):
+            profiler.get_snapshot("a")
+
+    def test_unknown_job(self, profiler):
+        with pytest.raises(tmc_memory.UnknownJobError):
+            profiler.result(42)
+
+
+@pytest.fixture
+def client(profiler):
+    server = tmc_server.TMCServer()
+    server.add_url_handles(tmc_memory.memory_routes(
+        profiler,
+        "/_debug/memory",
+        lambda user, password: user == "admin",
+        10.0,
+    ))
+
+    return server.test_client()
+
+
+class TestMemoryRoutes:
+    def get(self, client, route, **params):
+        return client.get(
+            "/_debug/memory" + route,
+            params=params,
+            auth=("admin", ""),
+        )
+
+    def post(self, client, route, **params):
+        return client.post(
+            "/_debug/memory" + route,
+            json=params,
+            auth=("admin", ""),
+        )
+
+    def test_requires_authorization(self, client):
+        assert client.get("/_debug/memory").status_code == 503
+
+    def test_snapshots(self, client):
+        resp = self.post(client, "/snapshot", name="before")
+        assert resp.status_code == 200
+        leak = [bytearray(1000) for _ in range(1000)]
+        self.post(client, "/snapshot", name="after")
+        assert self.get(client, "").json()["snapshots"] == ["before", "after"]
+
+        resp = self.get(client, "/top", name="after", limit=3)
+        assert resp.status_code == 200
+        assert len(resp.json()["result"]) == 3
+
+        resp = self.get(client, "/diff", old="before", new="after", limit=1)
+        assert resp.status_code == 200
+        assert resp.json()["result"][0]["size_diff"] >= 1000 * 1000
+        assert len(leak) == 1000
+
+    def test_pending_comparison(self, client, profiler):
+        self.post(client, "/snapshot", name="now")
+        # Keeps the single background thread busy.
+        release = threading.Event()
+        profiler.submit(release.wait, 10.0)
+
+        resp = self.get(client, "/top", name="now", wait=0)
+        assert resp.status_code == 202
+        job = resp.json()["job"]
+
+        release.set()
+        resp = self.get(client, "/result", job=job)
+        assert resp.status_code == 200
+        assert resp.json()["job"] == job
+        assert resp.json()["result"]
+
+    def test_stop_and_start(self, client):
+        resp = self.post(client, "/stop")
+        assert resp.json()["tracing"] is False
+        assert self.post(client, "/snapshot", name="now").status_code == 409
+
+        resp = self.post(client, "/start", frames=2)
+        assert resp.json()["tracing"] is True
+        assert self.post(client, "/snapshot", name="now").status_code == 200
+
+    def test_unknown(self, client):
+        resp = self.get(client, "/top", name="missing")
+        assert resp.status_code == 404
+        assert self.get(client, "/result", job=42).status_code == 404
+
+    @pytest.mark.parametrize("route, params", [
+        ("/result", {"job": "abc"}),
+        ("/result", {"job": 1, "wait": "abc"}),
+        ("/top", {"name": "now", "limit": "abc"}),
+        ("/top", {"name": "now", "limit": -1}),
+        ("/top", {"name": "now", "wait": "abc"}),
+        ("/top", {"name": "now", "key_type": "abc"}),
+        ("/top", {"name": "now", "limit": "inf"}),
+        ("/top", {"name": "now", "wait": "inf"}),
+        ("/result", {"job": 1, "wait": "inf"}),
+        ("/result", {"job": 1, "wait": tmc_memory.MAX_WAIT + 1}),
+    ])
+    def test_invalid_parameters(self, client, route, params):
+        resp = self.get(client, route, **params)
+        assert resp.status_code == 400
+        assert "error" in resp.json()
+
+    def test_caps_default_wait(self, profiler):
+        with pytest.raises(AssertionError):
+            tmc_memory.memory_routes(profiler, "/memory", None, 3600.0)
+
+    def test_invalid_frames(self, client):
+        self.post(client, "/stop")
+        assert self.post(client, "/start", frames=0).status_code == 400
+        assert self.post(client, "/start", frames="abc").status_code == 400
@@ -0,0 +1,50 @@
+import time
+import threading
+
+import pytest
+
+from .context import tmc_profiler
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+class TestProfiler:
+    def test_thread_dump(self):
+        dump = tmc_profiler.thread_dump()
+        assert "MainThread" in dump
+        assert "test_thread_dump" in dump
+
+    def test_collapsed_stacks(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,), name="busy")
+        worker.start()
+        try:
+            output = tmc_profiler.TMCSampler().collapsed(0.1, 200)
+        finally:
+            stop.set()
+            worker.join()
+
+        lines = output.splitlines()
+        assert lines
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert any(
+            line.startswith("busy;") and "busy_loop" in line
+            for line in lines
+        )
+
+    def test_one_session_at_a_time(self):
+        sampler = tmc_profiler.TMCSampler()
+        session = threading.Thread(target=sampler.sample, args=(0.3, 10))
+        session.start()
+        time.sleep(0.05)
+        try:
+            assert sampler.busy
+            with pytest.raises(tmc_profiler.ProfilerBusyError):
+                sampler.sample(0.1, 10)
+        finally:
+            session.join()
+
+        assert not sampler.busy
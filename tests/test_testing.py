@@ -0,0 +1,99 @@
+import json
+
+from unittest.mock import MagicMock
+
+from .context import tmc_server
+
+
+def make_server():
+    server = tmc_server.TMCServer()
+
+    @server.route("/foobar")
+    def foobar(foo=None, bar=None):
+        return str(foo) + str(bar)
+
+    @server.route("/foobar", methods=["POST"])
+    def post_foobar(foo, bar):
+        return json.dumps({"foo": foo, "bar": bar})
+
+    @server.route("/teapot")
+    def teapot():
+        return tmc_server.TMCResponse("short and stout", 418)
+
+    return server
+
+
+class TestTestClient:
+    def test_get(self):
+        client = make_server().test_client()
+        resp = client.get("/foobar?foo=3&bar=true")
+        assert resp.status_code == 200
+        assert resp.text == "3True"
+
+        resp = client.get("/foobar", params={"foo": 3})
+        assert resp.text == "3None"
+
+    def test_post(self):
+        client = make_server().test_client()
+        resp = client.post("/foobar", json={"foo": 3, "bar": True})
+        assert resp.json() == {"foo": 3, "bar": True}
+
+        resp = client.post("/foobar", data={"foo": 3, "bar": True})
+        assert resp.json() == {"foo": 3, "bar": True}
+
+    def test_unknown_route(self):
+        client = make_server().test_client()
+        assert client.get("/barfoo").status_code == 404
+        assert client.post("/teapot").status_code == 404
+
+    def test_response_status(self):
+        resp = make_server().test_client().get("/teapot")
+        assert resp.status_code == 418
+        assert resp.text == "short and stout"
+
+    def test_auth(self):
+        server = tmc_server.TMCServer()
+        authorize = MagicMock(side_effect=lambda user, pw: user == "foo")
+        server.add_url_handle("/secret", lambda: "secret", authorize)
+        client = server.test_client()
+
+        assert client.get("/secret").status_code == 503
+        resp = client.get("/secret", auth=("foo", "bar"))
+        assert resp.text == "secret"
+        authorize.assert_called_with("foo", "bar")
+
+    def test_sees_routes_added_later(self):
+        server = make_server()
+        client = server.test_client()
+        server.add_url_handle("/late", lambda: "late")
+        assert client.get("/late").text == "late"
+
+    def test_file_range(self, tmp_path):
+        (tmp_path / "app.log").write_bytes(b"line1\nline2\nline3\n")
+        server = tmc_server.TMCServer()
+        server.add_file_route("/logs", str(tmp_path))
+        client = server.test_client()
+
+        resp = client.get("/logs/app.log", headers={"Range": "bytes=-6"})
+        assert resp.status_code == 206
+        assert resp.data == b"line3\n"
+        assert resp.headers["Content-Range"] == "bytes 12-17/18"
+
+        resp = client.get("/logs/app.log", headers={"Range": "bytes=18-"})
+        assert resp.status_code == 416
+        assert client.get("/logs/../app.log").status_code == 404
+
+    def test_batch(self):
+        server = make_server().enable_batch(max_requests=2)
+        client = server.test_client()
+        resp = client.post("/_batch", json=[
+            {"route": "/foobar", "params": {"foo": 1, "bar": 2}},
+            {"route": "/teapot"},
+        ])
+
+        assert resp.json() == [
+            {"status": 200, "body": "12"},
+            {"status": 418, "body": "short and stout"},
+        ]
+
+        assert client.post("/_batch", json=[{}] * 3).status_code == 413
@@ -0,0 +1,132 @@
+import time
+
+from array import array
+from types import SimpleNamespace
+
+import pytest
+
+from .context import tmc_server, tmc_timeseries
+
+
+def make_series(capacity=10, samples=25):
+    series = tmc_timeseries.TMCSeries("foo", None, 1.0, capacity)
+    for i in range(samples):
+        series.append(1000.0 + i, float(i % 7))
+
+    return series
+
+
+class TestSeries:
+    def test_ring_buffer_keeps_latest(self):
+        times, values = make_series().snapshot()
+        assert list(times) == [1015.0 + i for i in range(10)]
+        assert list(values) == [float((15 + i) % 7) for i in range(10)]
+
+    def test_partial_buffer(self):
+        times, _ = make_series(capacity=10, samples=4).snapshot()
+        assert list(times) == [1000.0, 1001.0, 1002.0, 1003.0]
+
+    def test_downsample(self):
+        buckets = make_series().downsample(1015.0, 1024.0, 3)
+        assert [b.count for b in buckets] == [3, 3, 4]
+        assert buckets[0].time == 1015.0
+        assert buckets[0].min == 1.0
+        assert buckets[0].max == 3.0
+        assert buckets[0].mean == 2.0
+
+    def test_numpy_matches_python(self):
+        pytest.importorskip("numpy")
+        times, values = make_series(100, 250).snapshot()
+        args = (times, values, 1160.0, 1240.0, 80.0 / 7, 7)
+        assert tmc_timeseries._downsample_numpy(*args) == pytest.approx(
+            tmc_timeseries._downsample_python(*args))
+
+    def test_empty_range(self):
+        assert make_series().downsample(0.0, 10.0, 5) == []
+
+
+class InterleavedArray(array):
+    """Calls hook the first time the array is copied."""
+
+    def __getitem__(self, key):
+        hook, self.hook = getattr(self, "hook", None), None
+        if hook is not None:
+            hook()
+
+        return super().__getitem__(key)
+
+
+class TestSnapshot:
+    def test_retries_write_between_copies(self, monkeypatch):
+        series = make_series(capacity=4, samples=4)
+        series.values = InterleavedArray("d", series.values)
+
+        def begin_write():
+            # The writer stores the oldest slot's new sample, but
+            # hasn't incremented count yet.
+            series.sequence += 1
+            series.times[0] = 2000.0
+            series.values[0] = 99.0
+
+        def finish_write(seconds):
+            series.count += 1
+            series.sequence += 1
+
+        series.values.hook = begin_write
+        monkeypatch.setattr(tmc_timeseries.time, "sleep", finish_write)
+        times, values = series.snapshot()
+
+        assert list(times) == [1001.0, 1002.0, 1003.0, 2000.0]
+        assert list(values) == [1.0, 2.0, 3.0, 99.0]
+
+
+class TestTimeSeriesStore:
+    def test_samples_on_interval(self):
+        store = tmc_timeseries.TMCTimeSeriesStore(tick=0.01)
+        values = iter(range(1000))
+        store.register("foo", lambda: next(values), interval=0.02)
+        store.register("skipped", lambda: None)
+        store.start()
+        time.sleep(0.2)
+        store.stop(1.0)
+
+        result = store.query("foo", start=-10, points=1)
+        assert 3 <= result["buckets"][0]["count"] <= 11
+        assert result["buckets"][0]["min"] == 0.0
+        assert store.query("skipped")["buckets"] == []
+
+    def test_wall_clock_step_back(self, monkeypatch):
+        wall = [time.time()]
+        monkeypatch.setattr(tmc_timeseries, "time", SimpleNamespace(
+            time=lambda: wall[0],
+            monotonic=time.monotonic,
+            sleep=time.sleep,
+        ))
+
+        store = tmc_timeseries.TMCTimeSeriesStore()
+        values = iter(range(1000))
+        store.register("foo", lambda: next(values), interval=0.0)
+        for step in (1.0, 1.0, 1.0, -30.0, 1.0):
+            store.sample_due()
+            wall[0] += step
+
+        bucket, = store.query("foo", start=-10, points=1)["buckets"]
+        assert bucket["count"] == 5
+        assert wall[0] - 10 <= bucket["time"] <= wall[0]
+
+    def test_route(self):
+        server = tmc_server.TMCServer()
+
+        @server.metric("foo", capacity=10)
+        def foo():
+            return 42
+
+        server.enable_timeseries_route()
+        server.timeseries.sample_due()
+        client = server.test_client()
+
+        assert client.get("/_timeseries").json() == ["foo"]
+        result = client.get("/_timeseries?name=foo&points=5").json()
+        assert result["buckets"][0]["mean"] == 42.0
+        assert client.get("/_timeseries?name=bar").status_code == 404
+        assert client.get("/_timeseries?name=foo&points=0").status_code == 400
@@ -1,3 +1,10 @@
+import os
+import sys
+import stat
+import time
+import socket
+import http.client
+import subprocess
 import pytest
 import json
 from unittest.mock import MagicMock
@@ -8,6 +15,59 @@ from requests.auth import HTTPBasicAuth
 from .context import tmc_server
 
 
+# Third-party modules that must only be imported on first use.
+LAZY_MODULES = ("magic", "http_basic_auth")
+
+# Budget in microseconds for the package's own modules, excluding the
+# standard library (http.server et al.) which we can't do much about.
+IMPORT_BUDGET_US = 25000
+
+
+class TestImport:
+    def _import_times(self):
+        proc = subprocess.run(
+            [
+                sys.executable,
+                "-X", "importtime",
+                "-c", "import sys, tmc_http_server.tmc_http_server; "
+                      "print(' '.join(sys.modules))",
+            ],
+            cwd=os.path.join(os.path.dirname(__file__), ".."),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        times = {}
+        for line in proc.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                own, _, name = line[len("import time:"):].split("|")
+                if own.strip().isdigit():
+                    times[name.strip()] = int(own)
+
+        return times, proc.stdout.split()
+
+    def test_optional_dependencies_are_lazy(self):
+        _, modules = self._import_times()
+        for name in LAZY_MODULES:
+            assert name not in modules
+
+    def test_import_time(self):
+        times, _ = self._import_times()
+        own = sum(
+            time for name, time in times.items()
+            if name.startswith("tmc_http_server")
+        )
+
+        assert own < IMPORT_BUDGET_US
+
+    def test_guess_mime_type_without_libmagic(self):
+        handler = MagicMock()
+        handler.server.magic = None
+        assert tmc_server.TMCRequestHandler.guess_mime_type(
+            handler, "foo") == "text/plain"
+
+
 class TestTryParse:
     def test_try_parse_string(self):
         foo = tmc_server.try_parse("foo")
@@ -87,20 +147,69 @@ class TestServer:
             def barfoo():
                 return "foobar!"
 
-    def test_throws_on_route_add_while_running(self):
-        server = tmc_server.TMCServer()
+    def test_add_route_while_running(self):
+        server = tmc_server.TMCServer(port=8089)
         @server.route("/foobar")
         def foobar():
             return "foobar!"
 
         server.start()
-        with pytest.raises(AssertionError):
-            @server.route("/barfoo")
-            def barfoo():
-                return "foobar!"
+        before = server.route_rules
+
+        @server.route("/barfoo")
+        def barfoo():
+            return "foobar!"
 
         server.stop()
         server.join(0.5)
+        assert "/barfoo, GET" in server.route_rules
+        assert "/barfoo, GET" not in before
+
+    def test_remove_route(self):
+        server = tmc_server.TMCServer()
+        @server.route("/foobar", methods="GET, POST")
+        def foobar():
+            return "foobar!"
+
+        server.remove_url_handle("/foobar", methods="POST")
+        assert list(server.route_rules) == ["/foobar, GET"]
+
+        with pytest.raises(AssertionError):
+            server.remove_url_handle("/foobar", methods="POST")
+
+    def test_remove_file_route(self, tmp_path):
+        server = tmc_server.TMCServer()
+        server.add_url_handle("/logs/", lambda: "logs")
+        server.add_file_route("/files/", str(tmp_path))
+        server.remove_url_handle("/files/")
+        assert list(server.route_rules) == ["/logs/, GET"]
+
+        server.add_file_route("/files", str(tmp_path))
+        server.remove_url_handle("/files/")
+        server.remove_url_handle("/logs/")
+        assert not server.route_rules
+
+    def test_bulk_add_is_all_or_nothing(self):
+        server = tmc_server.TMCServer()
+        server.add_url_handles([
+            ("/foo", lambda: "foo"),
+            {"route": "/bar", "handler": lambda: "bar", "methods": "POST"},
+        ])
+
+        assert set(server.route_rules) == {"/foo, GET", "/bar, POST"}
+
+        with pytest.raises(AssertionError):
+            server.add_url_handles([
+                ("/baz", lambda: "baz"),
+                ("/foo", lambda: "foo"),
+            ])
+
+        assert "/baz, GET" not in server.route_rules
+
+    def test_throws_on_file_route_without_directory(self, tmp_path):
+        server = tmc_server.TMCServer()
+        with pytest.raises(NotADirectoryError):
+            server.add_file_route("/logs", str(tmp_path / "missing"))
 
     def test_throws_on_start_if_no_routes(self):
         on_error = MagicMock()
@@ -310,3 +419,114 @@ class TestAuth:
         server.stop()
         server.join(0.5)
         assert(req.status_code == 503)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost", timeout=0.5)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def accepts_connections(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+class TestUnixSocket:
+    def test_unix_socket_only(self, tmp_path):
+        path = str(tmp_path / "tmc.sock")
+        server = tmc_server.TMCServer(
+            port=None,
+            unix_socket=path,
+            unix_socket_mode=0o660,
+        )
+
+        @server.route("/foobar")
+        def foobar():
+            return "foobar!"
+
+        server.start()
+        # The socket is only chmod'ed after bind, but before listen.
+        wait_for(lambda: accepts_connections(path))
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+        conn = UnixHTTPConnection(path)
+        conn.request("GET", "/foobar")
+        resp = conn.getresponse()
+        body = resp.read()
+        conn.close()
+
+        server.stop()
+        server.join(1.0)
+        assert resp.status == 200
+        assert body == b"foobar!"
+        assert mode == 0o660
+        assert not server.is_alive()
+        assert not os.path.exists(path)
+
+    def test_replaces_stale_socket(self, tmp_path):
+        path = str(tmp_path / "tmc.sock")
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+
+        server = tmc_server.TMCServer(port=None, unix_socket=path)
+        server.add_url_handle("/foobar", lambda: "foobar!")
+        server.start()
+        time.sleep(0.2)
+        conn = UnixHTTPConnection(path)
+        conn.request("GET", "/foobar")
+        body = conn.getresponse().read()
+        conn.close()
+
+        server.stop()
+        server.join(1.0)
+        assert body == b"foobar!"
+
+    def test_refuses_to_replace_regular_file(self, tmp_path):
+        path = tmp_path / "tmc.sock"
+        path.write_text("not a socket")
+        server = tmc_server.TMCServer(port=None, unix_socket=str(path))
+        with pytest.raises(FileExistsError):
+            server.create_unix_http_server()
+
+        assert path.read_text() == "not a socket"
+
+    def test_requires_port_or_unix_socket(self):
+        with pytest.raises(AssertionError):
+            tmc_server.TMCServer(port=None)
+
+    @pytest.mark.skipif(
+        not sys.platform.startswith("linux"),
+        reason="Abstract sockets are Linux only",
+    )
+    def test_abstract_socket(self):
+        name = "tmc-test-{}".format(os.getpid())
+        server = tmc_server.TMCServer(port=None, unix_socket="@" + name)
+        server.add_url_handle("/foobar", lambda: "foobar!")
+        server.start()
+        time.sleep(0.2)
+        conn = UnixHTTPConnection("\0" + name)
+        conn.request("GET", "/foobar")
+        body = conn.getresponse().read()
+        conn.close()
+
+        server.stop()
+        server.join(1.0)
+        assert body == b"foobar!"
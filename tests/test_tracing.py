@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+
+from .context import tmc_server, tmc_tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+TRACEPARENT = "00-{}-{}-01".format(TRACE_ID, PARENT_ID)
+
+
+def parse_server_timing(header):
+    entries = {}
+    for entry in header.split(", "):
+        name, param = entry.split(";", 1)
+        entries[name] = param.split("=", 1)[1]
+
+    return entries
+
+
+class TestTraceparent:
+    def test_parse(self):
+        assert tmc_tracing.parse_traceparent(TRACEPARENT) == (
+            TRACE_ID, PARENT_ID, "01"
+        )
+
+        # Later versions may append fields.
+        assert tmc_tracing.parse_traceparent(
+            "01-{}-{}-00-extra".format(TRACE_ID, PARENT_ID)
+        ) == (TRACE_ID, PARENT_ID, "00")
+
+    @pytest.mark.parametrize("header", [
+        "",
+        "00-{}-{}-01-extra".format(TRACE_ID, PARENT_ID),
+        "ff-{}-{}-01".format(TRACE_ID, PARENT_ID),
+        "00-{}-{}-01".format("0" * 32, PARENT_ID),
+        "00-{}-{}-01".format(TRACE_ID, "0" * 16),
+        "00-{}-{}-01".format(TRACE_ID.upper(), PARENT_ID),
+    ])
+    def test_rejects_invalid(self, header):
+        assert tmc_tracing.parse_traceparent(header) is None
+
+
+class TestTracing:
+    def make_server(self, **opts):
+        server = tmc_server.TMCServer()
+        server.enable_tracing(**opts)
+        seen = []
+
+        @server.route("/traced")
+        def traced():
+            seen.append(tmc_tracing.current_trace())
+            return "traced"
+
+        return server, seen
+
+    def test_server_timing(self):
+        server, seen = self.make_server()
+        resp = server.test_client().get("/traced")
+        timing = parse_server_timing(resp.headers["Server-Timing"])
+
+        assert resp.text == "traced"
+        for phase in ("parse", "route", "authorize", "unpack", "handler",
+                      "encode", "total"):
+            assert float(timing[phase]) >= 0
+
+        # The trace is the one the handler saw, and a new root.
+        trace = seen[0]
+        assert timing["traceparent"] == '"{}"'.format(trace.traceparent)
+        assert trace.parent_id is None
+        assert tmc_tracing.current_trace() is None
+
+    def test_continues_traceparent(self):
+        server, seen = self.make_server()
+        server.test_client().get(
+            "/traced",
+            headers={"traceparent": TRACEPARENT},
+        )
+
+        trace = seen[0]
+        assert trace.trace_id == TRACE_ID
+        assert trace.parent_id == PARENT_ID
+        assert trace.span_id != PARENT_ID
+        assert trace.traceparent.startswith("00-{}-".format(TRACE_ID))
+
+    def test_exports_spans(self):
+        exported = []
+        done = threading.Event()
+
+        def sink(spans):
+            exported.extend(spans)
+            done.set()
+
+        server, _ = self.make_server(sink=sink, interval=0.01)
+        client = server.test_client()
+        client.get("/traced", headers={"traceparent": TRACEPARENT})
+        client.get("/missing")
+        while len(exported) < 2 and done.wait(1.0):
+            done.clear()
+
+        traced, missing = exported
+        assert traced.name == "GET /traced"
+        assert traced.status == 200
+        assert traced.trace_id == TRACE_ID
+        assert "write" in traced.phases
+        assert traced.duration_ms >= sum(traced.phases.values()) - 1e-6
+        assert missing.status == 404
+
+    def test_untraced_by_default(self):
+        server = tmc_server.TMCServer()
+        server.add_url_handle("/plain", lambda: "plain")
+        resp = server.test_client().get("/plain")
+        assert "Server-Timing" not in resp.headers
@@ -0,0 +1,155 @@
+"""
+.. py:module:: tmc_http_server.access_log
+    :platform: *nix
+    :synopsis: Structured access logging that never blocks a request
+        thread. Request threads queue a compact tuple, a background
+        thread turns it into JSON lines and keeps the most recent
+        records in memory for inspection from a route.
+"""
+import json
+import time
+import random
+
+from collections import deque
+
+from .background import TMCDrain
+from .tmc_http_server import _default_error_handler
+
+# Field names of the record tuples queued by request threads.
+FIELDS = (
+    "time",
+    "client",
+    "method",
+    "path",
+    "status",
+    "duration_ms",
+)
+
+
+class TMCAccessLogger:
+    """Pluggable access logger for TMCServer, replacing the default
+        synchronous write to stderr for every request. Only the path
+        of a request is logged, never the query string or body, as
+        they may contain credentials.
+
+        :param stream: Text stream to write JSON lines to, e.g. an
+            open file or sys.stderr. None to not write anything.
+        :param sink: Optional callable receiving lists of record
+            dicts on the background thread, e.g. to ship them to a
+            log aggregator.
+        :param sample_rate: Fraction of requests to log, between 0
+            and 1. Server errors (5xx) are always logged.
+        :param ring_size: Number of recent records kept in memory.
+        :param capacity: Maximum number of records waiting for the
+            background thread, the oldest are dropped beyond that.
+        :param interval: Seconds between writes to the stream/sink.
+        :param on_error: Callback for errors raised by the stream or
+            sink, defaults to the on_error of the TMCServer the logger
+            is passed to.
+    """
+
+    def __init__(
+            self,
+            stream=None,
+            sink=None,
+            sample_rate: float = 1.0,
+            ring_size: int = 1000,
+            capacity: int = 10000,
+            interval: float = 0.1,
+            on_error=None,
+        ):
+        """Initializer for TMCAccessLogger"""
+
+        self.on_error = on_error
+        self.stream = stream
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.ring = deque(maxlen=ring_size)
+        self.drain = TMCDrain(
+            self.write,
+            capacity=capacity,
+            interval=interval,
+            on_error=self.handle_error,
+            name="tmc-access-log",
+        )
+
+    def log(self, client: str, method: str, path: str, status: int,
+            duration: float):
+        """Queues a record, called on the request thread.
+
+            :param client: The client address.
+            :param method: The HTTP method.
+            :param path: The path of the request.
+            :param status: The response status code.
+            :param duration: Seconds from receiving the request to
+                sending the status line.
+        """
+
+        if status < 500 and self.sample_rate < 1.0:
+            if random.random() >= self.sample_rate:
+                return
+
+        self.drain.put((
+            time.time(),
+            client,
+            method,
+            path.split("?")[0],
+            status,
+            round(duration * 1000.0, 3),
+        ))
+
+    def write(self, records: list):
+        """Writes queued records, called on the background thread.
+
+            :param records: The record tuples.
+        """
+
+        entries = [dict(zip(FIELDS, record)) for record in records]
+        self.ring.extend(entries)
+
+        if self.stream is not None:
+            self.stream.write("".join(
+                json.dumps(entry) + "\n" for entry in entries
+            ))
+
+            self.stream.flush()
+
+        if self.sink is not None:
+            self.sink(entries)
+
+    def recent(self, limit: int = None, status: int = None) -> list:
+        """Returns the most recent records still in memory.
+
+            :param limit: Maximum number of records to return.
+            :param status: Only return records with this status code.
+            :returns: Record dicts, oldest first.
+        """
+
+        entries = list(self.ring)
+        if status is not None:
+            entries = [entry for entry in entries if entry["status"] == status]
+
+        if limit is not None:
+            entries = entries[-limit:] if limit > 0 else []
+
+        return entries
+
+    def handle_error(self, err: Exception):
+        """Passes an error of the stream or sink to on_error."""
+
+        (self.on_error or _default_error_handler)(err)
+
+    def start(self):
+        """Starts the background thread if it isn't running."""
+
+        self.drain.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        """Writes any queued records and stops the background thread.
+
+            :param timeout: Seconds to wait for the final write.
+        """
+
+        self.drain.stop(timeout)
+        return self
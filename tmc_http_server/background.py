@@ -0,0 +1,171 @@
+"""
+.. py:module:: tmc_http_server.background
+    :platform: *nix
+    :synopsis: Hands records from request threads to a background
+        thread so that slow sinks (stderr, files, exporters) never
+        hold up a request.
+"""
+from collections import deque
+from threading import Thread, Event, Lock
+
+from .tmc_http_server import _default_error_handler
+
+
+class TMCIntervalThread:
+    """Calls a function every interval seconds on a daemon thread, for
+        the components of a TMCServer that work in the background.
+        Can be started and stopped repeatedly.
+
+        :param target: Called without arguments on every tick.
+        :param interval: Seconds between calls.
+        :param name: Name of the thread.
+        :param final: Whether to call target once more when stopped.
+    """
+
+    def __init__(self, target, interval: float, name: str,
+                 final: bool = False):
+        """Initializer for TMCIntervalThread"""
+
+        self.target = target
+        self.interval = interval
+        self.name = name
+        self.final = final
+        self.__stopped = Event()
+        self.__thread = None
+        self.__lock = Lock()
+
+    @property
+    def running(self) -> bool:
+        """Whether the thread has been started and not stopped."""
+
+        return self.__thread is not None
+
+    def run(self):
+        """Body of the thread."""
+
+        while not self.__stopped.wait(self.interval):
+            self.target()
+
+        if self.final:
+            self.target()
+
+    def start(self):
+        """Starts the thread if it isn't running."""
+
+        with self.__lock:
+            if self.__thread is None:
+                self.__stopped.clear()
+                self.__thread = Thread(
+                    target=self.run,
+                    name=self.name,
+                    daemon=True,
+                )
+
+                self.__thread.start()
+
+        return self
+
+    def stop(self, timeout: float = None):
+        """Stops the thread.
+
+            :param timeout: Seconds to wait for the thread.
+        """
+
+        with self.__lock:
+            thread, self.__thread = self.__thread, None
+            self.__stopped.set()
+
+        if thread is not None:
+            thread.join(timeout)
+
+        return self
+
+
+class TMCDrain:
+    """A bounded queue drained by a background thread. Putting an
+        item is a single deque append, which is atomic in CPython,
+        so request threads never take a lock or wait on the sink.
+        When the sink falls behind and the queue is full the oldest
+        items are dropped and counted in dropped.
+
+        :param sink: Called on the background thread with a list of
+            the items queued since the last call.
+        :param capacity: Maximum number of queued items.
+        :param interval: Seconds between drains.
+        :param on_error: Callback for errors raised by the sink.
+        :param name: Name of the background thread.
+    """
+
+    def __init__(
+            self,
+            sink,
+            capacity: int = 10000,
+            interval: float = 0.1,
+            on_error=_default_error_handler,
+            name: str = "tmc-drain",
+        ):
+        """Initializer for TMCDrain"""
+
+        self.sink = sink
+        self.interval = interval
+        self.on_error = on_error
+        self.name = name
+        self.dropped = 0
+        self.__queue = deque(maxlen=capacity)
+        self.__worker = TMCIntervalThread(
+            self.flush,
+            interval,
+            name,
+            final=True,
+        )
+
+    def put(self, item):
+        """Queues an item without blocking, starting the background
+            thread on first use.
+
+            :param item: The item to hand to the sink.
+        """
+
+        if not self.__worker.running:
+            self.start()
+
+        queue = self.__queue
+        if len(queue) == queue.maxlen:
+            # Racy, but an approximate count is all we need.
+            self.dropped += 1
+
+        queue.append(item)
+
+    def flush(self):
+        """Hands all queued items to the sink. Called periodically on
+            the background thread, but safe to call from anywhere.
+        """
+
+        items = []
+        try:
+            while True:
+                items.append(self.__queue.popleft())
+
+        except IndexError:
+            pass
+
+        if items:
+            try:
+                self.sink(items)
+            except Exception as err:
+                self.on_error(err)
+
+    def start(self):
+        """Starts the background thread if it isn't running."""
+
+        self.__worker.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        """Stops the background thread after a final drain.
+
+            :param timeout: Seconds to wait for the final drain.
+        """
+
+        self.__worker.stop(timeout)
+        return self
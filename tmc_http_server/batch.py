@@ -0,0 +1,126 @@
+"""
+.. py:module:: tmc_http_server.batch
+    :platform: *nix
+    :synopsis: Executes several route calls from a single POST request
+        so that e.g. a dashboard refresh pays for the connection,
+        authorization and headers once instead of once per route.
+"""
+from threading import Lock
+
+from .bulkhead import BulkheadFullError
+from .encoding import is_structured
+from .tmc_http_server import format_route_key, TMCKnownRoute, TMCResponse
+
+
+class TMCBatch:
+    """Runs the sub-requests of batch requests concurrently on a
+        bounded, lazily started thread pool shared by all batch
+        requests to the route.
+
+        :param max_requests: Maximum number of sub-requests per batch.
+        :param max_workers: Number of threads in the pool.
+        :param on_error: Callback for errors raised by the handlers.
+    """
+
+    def __init__(self, max_requests: int, max_workers: int, on_error):
+        """Initializer for TMCBatch"""
+
+        self.max_requests = max_requests
+        self.max_workers = max_workers
+        self.on_error = on_error
+        self.__pool = None
+        self.__lock = Lock()
+
+    @property
+    def pool(self):
+        """The thread pool, started on first use."""
+
+        if self.__pool is None:
+            with self.__lock:
+                if self.__pool is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self.__pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="tmc-batch",
+                    )
+
+        return self.__pool
+
+    def call(self, rules, request, username: str, password: str) -> dict:
+        """Executes one sub-request.
+
+            :param rules: The route rules to resolve the route against.
+            :param request: The sub-request, a dict with the keys
+                'route', and optionally 'method' and 'params'.
+            :param username: The username from the batch request.
+            :param password: The password from the batch request.
+            :returns: A dict with the HTTP status and the body, the
+                result itself if it is structured, else its str.
+        """
+
+        try:
+            path = request["route"]
+            method = request.get("method", "GET")
+            params = request.get("params") or {}
+            key = format_route_key(path, method)
+
+        except (TypeError, KeyError, AttributeError):
+            return {"status": 400, "body": "Malformed sub-request"}
+
+        if not isinstance(params, dict):
+            return {"status": 400, "body": "params must be an object"}
+
+        route = rules.get(key)
+        if route is None:
+            return {"status": 404, "body": "Not found"}
+
+        # File and batch routes write to the socket themselves and
+        # can't be embedded in a JSON array.
+        if not isinstance(route, TMCKnownRoute):
+            return {"status": 400, "body": "Route can't be batched"}
+
+        if not route.authenticate(username, password):
+            return {"status": 503, "body": "Forbidden"}
+
+        try:
+            if route.bulkhead is None:
+                result = route.handle(**params)
+
+            else:
+                with route.bulkhead:
+                    result = route.handle(**params)
+
+        except BulkheadFullError:
+            return {"status": 503, "body": "Busy"}
+
+        except Exception as err:
+            self.on_error(err)
+            return {"status": 500, "body": "Internal error"}
+
+        status = 200
+        if isinstance(result, TMCResponse):
+            result, status = result.body, result.status
+
+        # Structured results are embedded as JSON values, like they
+        # are sent when the route is called on its own.
+        if not is_structured(result):
+            result = str(result)
+
+        return {"status": status, "body": result}
+
+    def execute(self, rules, requests, username: str, password: str) -> list:
+        """Executes the sub-requests of a batch concurrently.
+
+            :param rules: The route rules to resolve the routes against.
+            :param requests: The list of sub-requests, see call.
+            :param username: The username from the batch request.
+            :param password: The password from the batch request.
+            :returns: The results, in the same order as the requests.
+        """
+
+        futures = [
+            self.pool.submit(self.call, rules, request, username, password)
+            for request in requests
+        ]
+
+        return [future.result() for future in futures]
@@ -0,0 +1,126 @@
+"""
+.. py:module:: tmc_http_server.bulkhead
+    :platform: *nix
+    :synopsis: Per-route concurrency limits, so a flood of calls to an
+        expensive route can't tie up the threads that cheap routes,
+        e.g. a liveness probe, need to answer promptly.
+"""
+from typing import Optional
+from threading import Condition
+
+
+class BulkheadFullError(Exception):
+    """Exception raised when a bulkhead has no free slot within its
+        queue timeout, the handler answers with a 503.
+    """
+
+
+class TMCBulkhead:
+    """Limits the number of concurrent calls to a route. Calls beyond
+        the limit wait for a free slot for up to queue_timeout seconds
+        and are rejected after that, or right away if the queue is
+        full.
+
+        :param name: The route the bulkhead protects.
+        :param max_concurrency: Maximum number of concurrent calls.
+        :param queue_timeout: Seconds a call waits for a free slot, 0
+            to reject it right away and None to wait indefinitely.
+        :param max_queue: Maximum number of waiting calls, None for no
+            limit.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            max_concurrency: int,
+            queue_timeout: Optional[float] = 0.0,
+            max_queue: Optional[int] = None,
+        ):
+        """Initializer for TMCBulkhead"""
+
+        if max_concurrency < 1:
+            raise AssertionError(
+                "Invariant violation: max_concurrency of {} must be at "
+                "least 1.".format(name)
+            )
+
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        # Gauges, see stats. Only changed with the condition's lock
+        # held, reads are racy but never torn.
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.__slots = Condition()
+
+    def acquire(self) -> bool:
+        """Takes a slot, waiting for one if the bulkhead is full.
+
+            :returns: Whether a slot was taken.
+        """
+
+        with self.__slots:
+            if self.in_flight >= self.max_concurrency:
+                queue_full = self.queue_timeout == 0 or (
+                    self.max_queue is not None
+                    and self.waiting >= self.max_queue
+                )
+
+                if queue_full:
+                    self.rejected += 1
+                    return False
+
+                self.waiting += 1
+                try:
+                    free = self.__slots.wait_for(
+                        lambda: self.in_flight < self.max_concurrency,
+                        self.queue_timeout,
+                    )
+
+                finally:
+                    self.waiting -= 1
+
+                if not free:
+                    self.rejected += 1
+                    return False
+
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        """Frees a slot taken with acquire."""
+
+        with self.__slots:
+            self.in_flight -= 1
+            self.completed += 1
+            self.__slots.notify()
+
+    def __enter__(self):
+        if not self.acquire():
+            raise BulkheadFullError(self.name)
+
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def stats(self) -> dict:
+        """The limits and gauges of the bulkhead.
+
+            :returns: Dict with the limits, the number of calls in
+                flight and waiting, and the totals of completed and
+                rejected calls.
+        """
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queue_timeout": self.queue_timeout,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
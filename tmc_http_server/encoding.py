@@ -0,0 +1,288 @@
+"""
+.. py:module:: tmc_http_server.encoding
+    :platform: *nix
+    :synopsis: Encodes structured handler results (dicts, lists, NumPy
+        arrays) as JSON, MessagePack or CBOR depending on the Accept
+        header. The binary formats are optional dependencies, loaded
+        on first use, and carry NumPy arrays as raw typed buffers
+        instead of one number at a time.
+"""
+import sys
+import json
+import datetime
+import importlib
+
+from typing import Optional, Tuple
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# Media types we can encode, in order of preference when the client
+# accepts several equally, with the other names they go by and the
+# module implementing them, None for the standard library.
+ENCODINGS = (
+    (JSON, (), None),
+    (MSGPACK, ("application/x-msgpack", "application/vnd.msgpack"), "msgpack"),
+    (CBOR, (), "cbor2"),
+)
+
+# Results of these types are encoded, anything else is sent as str.
+STRUCTURED = (dict, list, tuple)
+
+# Optional codec modules by name, see load_codec. None if the module
+# turned out to be unavailable.
+_CODECS = {}
+
+# RFC 8746 typed array tags are 0b010fsell: f for float, s for signed,
+# e for little endian and ll for the item size. These map item sizes
+# to ll for integers and floats.
+_INT_SIZES = {1: 0, 2: 1, 4: 2, 8: 3}
+_FLOAT_SIZES = {2: 0, 4: 1, 8: 2}
+
+# RFC 8746 tag for row-major multi-dimensional arrays.
+_CBOR_NDARRAY = 40
+
+
+def load_codec(name: str):
+    """Imports an optional codec module on first use.
+
+        :param name: The name of the module.
+        :returns: The module, or None if it isn't installed.
+    """
+
+    codec = _CODECS.get(name, False)
+    if codec is False:
+        try:
+            codec = importlib.import_module(name)
+        except ImportError:
+            codec = None
+
+        _CODECS[name] = codec
+
+    return codec
+
+
+def _numpy():
+    """NumPy if the application has imported it, there can't be any
+        arrays to encode otherwise.
+    """
+
+    return sys.modules.get("numpy")
+
+
+def is_structured(value) -> bool:
+    """Whether a handler result is encoded rather than sent as str.
+
+        :param value: The handler result.
+    """
+
+    if isinstance(value, STRUCTURED):
+        return True
+
+    numpy = _numpy()
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+
+def parse_accept(header: str) -> list:
+    """Parses an Accept header.
+
+        :param header: The header value.
+        :returns: List of (media range, quality) tuples.
+    """
+
+    ranges = []
+    for part in header.split(","):
+        media_range, *params = part.split(";")
+        media_range = media_range.strip().lower()
+        if not media_range:
+            continue
+
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        ranges.append((media_range, quality))
+
+    return ranges
+
+
+def _quality(names, ranges) -> float:
+    """The quality the client gave the most specific media range
+        matching any of the names, 0 if none matches.
+    """
+
+    best, specificity = 0.0, -1
+    for media_range, quality in ranges:
+        if media_range in names:
+            rank = 2
+        elif media_range == "*/*":
+            rank = 0
+        elif media_range.endswith("/*") and any(
+                name.startswith(media_range[:-1]) for name in names):
+            rank = 1
+        else:
+            continue
+
+        if rank > specificity:
+            best, specificity = quality, rank
+
+    return best
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Picks the media type to encode a structured result as. Falls
+        back to JSON rather than answering with a 406 if the client
+        accepts none of the available ones.
+
+        :param accept: The Accept header, if any.
+        :returns: The media type.
+    """
+
+    if not accept:
+        return JSON
+
+    ranges = parse_accept(accept)
+    best, best_quality = JSON, 0.0
+    for media_type, aliases, module in ENCODINGS:
+        if module is not None and load_codec(module) is None:
+            continue
+
+        quality = _quality((media_type,) + aliases, ranges)
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+
+    return best
+
+
+def _json_default(value):
+    """Encodes the NumPy types the json module doesn't know, and
+        anything else (datetimes, sets, ...) as its str, like results
+        that aren't structured.
+    """
+
+    numpy = _numpy()
+    if numpy is not None:
+        if isinstance(value, numpy.ndarray):
+            return value.tolist()
+
+        if isinstance(value, numpy.generic):
+            return value.item()
+
+    return str(value)
+
+
+def _msgpack_default(value):
+    """Encodes NumPy arrays as a map of the dtype, shape and the raw
+        buffer, as MessagePack has no array extension of its own, and
+        anything else msgpack doesn't know as its str.
+    """
+
+    numpy = _numpy()
+    if numpy is not None:
+        if isinstance(value, numpy.ndarray) and value.dtype.kind != "O":
+            return {
+                "dtype": value.dtype.str,
+                "shape": list(value.shape),
+                "data": numpy.ascontiguousarray(value).tobytes(),
+            }
+
+        if isinstance(value, (numpy.ndarray, numpy.generic)):
+            return value.tolist()
+
+    return str(value)
+
+
+def typed_array_tag(dtype) -> Optional[int]:
+    """The RFC 8746 typed array tag for a NumPy dtype.
+
+        :param dtype: The dtype.
+        :returns: The tag, or None if there's none for the dtype.
+    """
+
+    little = dtype.byteorder == "<" or (
+        dtype.byteorder == "=" and sys.byteorder == "little"
+    )
+
+    if dtype.kind in "iu" and dtype.itemsize in _INT_SIZES:
+        if dtype.itemsize == 1:  # No byte order for single bytes.
+            return 72 if dtype.kind == "i" else 64
+
+        return (
+            64
+            | (dtype.kind == "i") << 3
+            | little << 2
+            | _INT_SIZES[dtype.itemsize]
+        )
+
+    if dtype.kind == "f" and dtype.itemsize in _FLOAT_SIZES:
+        return 80 | little << 2 | _FLOAT_SIZES[dtype.itemsize]
+
+    return None
+
+
+def _cbor_default(encoder, value):
+    """Encodes NumPy arrays as RFC 8746 multi-dimensional arrays of a
+        typed array, arrays of other dtypes as nested lists, and
+        anything else cbor2 doesn't know as its str.
+    """
+
+    numpy = _numpy()
+    if numpy is not None:
+        if isinstance(value, numpy.ndarray):
+            tag = typed_array_tag(value.dtype)
+            if tag is None:
+                encoder.encode(value.tolist())
+
+            else:
+                cbor2 = load_codec("cbor2")
+                encoder.encode(cbor2.CBORTag(_CBOR_NDARRAY, [
+                    list(value.shape),
+                    cbor2.CBORTag(
+                        tag,
+                        numpy.ascontiguousarray(value).tobytes(),
+                    ),
+                ]))
+
+            return
+
+        if isinstance(value, numpy.generic):
+            encoder.encode(value.item())
+            return
+
+    encoder.encode(str(value))
+
+
+def encode(value, accept: Optional[str] = None) -> Tuple[bytes, str]:
+    """Encodes a structured handler result.
+
+        :param value: The result, see is_structured.
+        :param accept: The Accept header of the request, if any.
+        :returns: Tuple of the body and its media type.
+    """
+
+    media_type = negotiate(accept)
+    if media_type == MSGPACK:
+        body = load_codec("msgpack").packb(
+            value,
+            default=_msgpack_default,
+            use_bin_type=True,
+        )
+
+    elif media_type == CBOR:
+        # cbor2 encodes datetimes itself but refuses naive ones.
+        body = load_codec("cbor2").dumps(
+            value,
+            default=_cbor_default,
+            timezone=datetime.timezone.utc,
+        )
+
+    else:
+        body = json.dumps(value, default=_json_default).encode()
+
+    return body, media_type
@@ -0,0 +1,153 @@
+"""
+.. py:module:: tmc_http_server.files
+    :platform: *nix
+    :synopsis: Helpers for serving files from whitelisted directories,
+        e.g. tailing an application log with a HTTP Range request.
+        The file contents are handed to the kernel with os.sendfile
+        where possible so they never pass through Python strings.
+"""
+import os
+import re
+import mmap
+
+from typing import Optional, Tuple
+
+# Size of the slices written to the socket when falling back to mmap.
+CHUNK_SIZE = 1 << 16
+
+# Only the single-range forms of the bytes unit are supported: "a-b",
+# "a-" and "-n". Anything else (multiple ranges, other units) is
+# ignored and the whole file is served, which RFC 7233 allows.
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class UnsatisfiableRangeError(Exception):
+    """Exception raised when a well-formed Range header does not
+        overlap the file, the handler answers with a 416.
+    """
+
+
+def resolve_path(directory: str, relative: str) -> Optional[str]:
+    """Resolves a path requested by a client against a whitelisted
+        directory. Symbolic links are resolved before the check, so
+        neither '..' segments nor links can escape the directory.
+
+        :param directory: The whitelisted directory, already resolved
+            with os.path.realpath.
+        :param relative: The path requested relative to the directory.
+        :returns: The absolute path to a regular file inside the
+            directory, or None if there is no such file.
+    """
+
+    try:
+        candidate = os.path.realpath(os.path.join(directory, relative))
+        if os.path.commonpath([directory, candidate]) != directory:
+            return None
+
+    except ValueError:  # Embedded null bytes, mixed drives, etc.
+        return None
+
+    if not os.path.isfile(candidate):
+        return None
+
+    return candidate
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parses the value of a HTTP Range header.
+
+        :param header: The header value, may be None.
+        :param size: The size of the file in bytes.
+        :returns: A tuple of the first and last (inclusive) byte
+            offsets to send, or None to send the whole file.
+        :raises UnsatisfiableRangeError: If the range lies entirely
+            outside of the file.
+    """
+
+    if not header:
+        return None
+
+    match = BYTE_RANGE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range, the final N bytes of the file: what a client
+        # tailing a log asks for.
+        length = int(last)
+        if length == 0 or size == 0:
+            raise UnsatisfiableRangeError(header)
+
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+
+    if start >= size:
+        raise UnsatisfiableRangeError(header)
+
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+def send_file(connection, wfile, fileobj, offset: int, count: int):
+    """Writes count bytes of fileobj starting at offset to the client.
+        Uses os.sendfile so the kernel copies straight from the page
+        cache to the socket, falling back to writing slices of a
+        read-only memory map through wfile when sendfile is not
+        available (non-blocking socket, not a real socket, etc.).
+
+        :param connection: The client socket.
+        :param wfile: The handler's output stream for the fallback.
+        :param fileobj: The open file, in binary mode.
+        :param offset: The offset of the first byte to send.
+        :param count: The number of bytes to send.
+    """
+
+    if count <= 0:
+        return
+
+    try:
+        # A socket with a timeout is non-blocking under the hood and
+        # sendfile would just raise BlockingIOError.
+        if connection.gettimeout() is None:
+            out_fd = connection.fileno()
+            in_fd = fileobj.fileno()
+            while count > 0:
+                sent = os.sendfile(out_fd, in_fd, offset, count)
+                if sent == 0:  # File was truncated underneath us.
+                    return
+
+                offset += sent
+                count -= sent
+
+    except (AttributeError, OSError):
+        pass
+
+    _send_mapped(wfile, fileobj, offset, count)
+
+
+def _send_mapped(wfile, fileobj, offset: int, count: int):
+    """Fallback for send_file, see there."""
+
+    if count <= 0:
+        return
+
+    with mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            end = min(offset + count, len(view))
+            while offset < end:
+                stop = min(offset + CHUNK_SIZE, end)
+                with view[offset:stop] as chunk:
+                    wfile.write(chunk)
+
+                offset = stop
+
+        finally:
+            view.release()
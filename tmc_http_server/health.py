@@ -0,0 +1,285 @@
+"""
+.. py:module:: tmc_http_server.health
+    :platform: *nix
+    :synopsis: Health checks that run concurrently in the background,
+        so a health route answers from cached results in constant time
+        no matter how many checks there are or how often it is polled.
+"""
+import json
+import time
+
+from collections import namedtuple
+from threading import Thread, Event, Lock
+
+from .background import TMCIntervalThread
+from .tmc_http_server import TMCResponse
+
+TMCHealthCheck = namedtuple('TMCHealthCheck', [
+    'name',
+    'check',
+    'timeout',
+    'interval',
+    'critical',
+])
+
+TMCHealthResult = namedtuple('TMCHealthResult', [
+    'ok',
+    'detail',
+    'duration_ms',
+    'checked_at',
+])
+
+PENDING = TMCHealthResult(False, "pending", None, None)
+
+
+class _TMCRun:
+    """A run of a check on its own thread."""
+
+    def __init__(self, deadline: float):
+        """Initializer for _TMCRun"""
+
+        self.deadline = deadline
+        # Set once the result is recorded.
+        self.done = Event()
+
+
+class TMCHealthRegistry:
+    """Runs registered health checks in the background, each on its
+        own interval, and keeps a pre-serialized report of the latest
+        results. A check passes if it returns a truthy value without
+        raising within its timeout. Whatever it returns other than
+        True is reported as the check's detail.
+
+        Every run gets a daemon thread of its own, so a check that
+        hangs holds up neither the other checks nor the process
+        exiting. It isn't started again until it returns, so there is
+        at most one thread per check.
+
+        :param tick: Seconds between scheduling passes.
+    """
+
+    def __init__(self, tick: float = 0.1):
+        """Initializer for TMCHealthRegistry"""
+
+        self.tick = tick
+        self.__checks = {}
+        self.__results = {}
+        # name -> _TMCRun of checks currently running.
+        self.__running = {}
+        self.__timed_out = set()
+        self.__due = {}
+        self.__report = None
+        self.__worker = TMCIntervalThread(
+            self.run_pending,
+            tick,
+            "tmc-health",
+        )
+        self.__lock = Lock()
+        self.__publish()
+
+    def register(
+            self,
+            name: str,
+            check,
+            timeout: float = 1.0,
+            interval: float = 10.0,
+            critical: bool = True,
+        ):
+        """Registers a health check.
+
+            :param name: The name to report the check under.
+            :param check: Callable without arguments.
+            :param timeout: Seconds after which a running check is
+                reported as failed.
+            :param interval: Seconds between runs of the check.
+            :param critical: Whether a failure makes the whole service
+                unhealthy (503) rather than degraded.
+            :returns: self.
+        """
+
+        with self.__lock:
+            if name in self.__checks:
+                raise AssertionError(
+                    "Invariant violation: health check {} already "
+                    "registered.".format(name)
+                )
+
+            self.__checks[name] = TMCHealthCheck(
+                name,
+                check,
+                timeout,
+                interval,
+                critical,
+            )
+
+            self.__results[name] = PENDING
+            self.__due[name] = 0.0
+            self.__publish()
+
+        return self
+
+    def __publish(self):
+        """Rebuilds the cached report, called with the lock held."""
+
+        checks = {}
+        failing = degraded = False
+        for name, check in self.__checks.items():
+            result = self.__results[name]
+            checks[name] = dict(result._asdict(), critical=check.critical)
+            if not result.ok:
+                failing = failing or check.critical
+                degraded = True
+
+        status = "failing" if failing else "degraded" if degraded else "ok"
+        self.__report = TMCResponse(
+            json.dumps({"status": status, "checks": checks}),
+            503 if failing else 200,
+            {"Content-Type": "application/json"},
+        )
+
+    def __run(self, check: TMCHealthCheck, run: _TMCRun):
+        """Body of the thread running a check."""
+
+        started = time.perf_counter()
+        try:
+            value = check.check()
+            ok, detail = bool(value), None if value is True else value
+
+        except Exception as err:
+            ok, detail = False, "{}: {}".format(type(err).__name__, err)
+
+        try:
+            json.dumps(detail)  # The detail ends up in the report.
+        except (TypeError, ValueError):
+            detail = repr(detail)
+
+        self.__finish(check.name, run, TMCHealthResult(
+            ok,
+            detail,
+            round((time.perf_counter() - started) * 1000.0, 3),
+            time.time(),
+        ))
+
+    def __time_out(self, name: str):
+        """Reports a check as timed out, called with the lock held."""
+
+        timeout = self.__checks[name].timeout
+        self.__results[name] = TMCHealthResult(
+            False,
+            "timed out after {}s".format(timeout),
+            round(timeout * 1000.0, 3),
+            time.time(),
+        )
+
+        self.__timed_out.add(name)
+
+    def __finish(self, name: str, run: _TMCRun, result: TMCHealthResult):
+        """Records the result of a check once it finished."""
+
+        try:
+            with self.__lock:
+                if self.__running.get(name) is not run:
+                    return
+
+                del self.__running[name]
+                if name in self.__timed_out:
+                    self.__timed_out.discard(name)
+
+                elif time.monotonic() > run.deadline:
+                    self.__time_out(name)
+                    self.__timed_out.discard(name)
+
+                else:
+                    self.__results[name] = result
+
+                self.__publish()
+
+        finally:
+            run.done.set()
+
+    def run_pending(self, force: bool = False):
+        """Starts the checks that are due and reports running checks
+            that have exceeded their timeout.
+
+            :param force: Start all checks that aren't running, due
+                or not.
+        """
+
+        now = time.monotonic()
+        with self.__lock:
+            changed = False
+            for name, check in self.__checks.items():
+                running = self.__running.get(name)
+                if running is not None:
+                    # A stuck check is reported once and not started
+                    # again until it returns.
+                    overdue = now > running.deadline
+                    if overdue and name not in self.__timed_out:
+                        self.__time_out(name)
+                        changed = True
+
+                    continue
+
+                if not force and now < self.__due[name]:
+                    continue
+
+                self.__due[name] = now + check.interval
+                run = self.__running[name] = _TMCRun(now + check.timeout)
+                Thread(
+                    target=self.__run,
+                    args=(check, run),
+                    name="tmc-health-{}".format(name),
+                    daemon=True,
+                ).start()
+
+            if changed:
+                self.__publish()
+
+    def refresh(self, timeout: float = None):
+        """Runs all checks now and waits for them, mostly useful in
+            tests or before serving the first request.
+
+            :param timeout: Seconds to wait at most, defaults to the
+                longest check timeout.
+        """
+
+        self.run_pending(force=True)
+        with self.__lock:
+            running = list(self.__running.values())
+            if timeout is None:
+                timeout = max(
+                    [check.timeout for check in self.__checks.values()],
+                    default=0.0,
+                )
+
+        end = time.monotonic() + timeout
+        for run in running:
+            run.done.wait(max(min(end, run.deadline) - time.monotonic(), 0.0))
+
+        # Anything still running now has timed out.
+        self.run_pending()
+        return self
+
+    @property
+    def report(self) -> TMCResponse:
+        """The cached report of the latest results, as a response
+            with a 503 status if a critical check is failing.
+        """
+
+        return self.__report
+
+    def start(self):
+        """Starts the scheduling thread if it isn't running."""
+
+        self.__worker.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        """Stops the scheduling thread. Checks already running finish
+            in the background, or are abandoned when the process exits.
+
+            :param timeout: Seconds to wait for the thread.
+        """
+
+        self.__worker.stop(timeout)
+        return self
@@ -0,0 +1,281 @@
+"""
+.. py:module:: tmc_http_server.heartbeat
+    :platform: *nix
+    :synopsis: Heartbeats of the application's own threads, to notice
+        worker loops that hang or die without taking the process down.
+        Beating writes two numbers into a slot reserved for the thread,
+        no lock is taken, so even thousands of busy threads don't
+        contend with each other or with the route reporting on them.
+"""
+import time
+
+from array import array
+from threading import Lock, local, current_thread
+
+# Number of slots allocated at once. Pages are never reallocated, so
+# a thread can keep writing to its slot while others register.
+PAGE_SIZE = 1024
+
+
+class TMCHeartbeat:
+    """The heartbeat slot of a thread, returned by
+        TMCHeartbeatRegistry.register. Only the thread it belongs to
+        should call beat.
+
+        :param slot: The slot number in the registry.
+        :param name: The name to report the thread under.
+        :param stall_after: Seconds without a beat after which the
+            thread is reported as stalled.
+        :param thread: The threading.Thread beating, if known.
+        :param last: The page of last beat times holding the slot.
+        :param count: The page of beat counts holding the slot.
+        :param index: The index of the slot in the pages.
+    """
+
+    def __init__(self, slot: int, name: str, stall_after: float, thread,
+                 last: array, count: array, index: int):
+        """Initializer for TMCHeartbeat"""
+
+        self.slot = slot
+        self.name = name
+        self.stall_after = stall_after
+        self.thread = thread
+        # Replaced as a whole by detach, so a beat always writes to
+        # one consistent slot.
+        self.__target = (last, count, index)
+        self.__scratch = None
+
+    def beat(self):
+        """Records that the thread is making progress, e.g. once per
+            iteration of its loop.
+        """
+
+        last, count, index = self.__target
+        last[index] = time.monotonic()
+        count[index] += 1
+
+    @property
+    def last_beat(self) -> float:
+        """time.monotonic of the last beat, or of the registration if
+            there was none yet.
+        """
+
+        last, _, index = self.__target
+        return last[index]
+
+    @property
+    def count(self) -> int:
+        """The number of beats so far."""
+
+        _, count, index = self.__target
+        return count[index]
+
+    def detach(self):
+        """Points the heartbeat at a scratch slot, so that beats after
+            the registry freed the slot don't land in another thread's.
+        """
+
+        self.__scratch = (array('d', [self.last_beat]), array('Q', [0]), 0)
+        self.__target = self.__scratch
+
+    @property
+    def quiescent(self) -> bool:
+        """Whether the thread can no longer write to the slot it was
+            detached from: it has beaten into the scratch slot since,
+            so a beat that loaded the old slot has completed, or it is
+            no longer running.
+        """
+
+        if self.__scratch is None:
+            return False
+
+        return self.__scratch[1][0] > 0 or not self.thread.is_alive()
+
+
+class TMCHeartbeatRegistry:
+    """Slots for the heartbeats of application threads, and a report of
+        which threads stopped beating.
+
+        :param window: Seconds over which the iteration rate of the
+            threads is measured.
+    """
+
+    def __init__(self, window: float = 10.0):
+        """Initializer for TMCHeartbeatRegistry"""
+
+        self.window = window
+        # (last beat times, beat counts) arrays of PAGE_SIZE slots.
+        self.__pages = []
+        # The TMCHeartbeat using each slot, None for free slots.
+        self.__slots = []
+        self.__free = []
+        # Heartbeats unregistered by another thread, whose slots are
+        # freed once they are quiescent.
+        self.__retired = []
+        # Beat counts at the start of the current rate window, and the
+        # rates measured over the previous one.
+        self.__window_start = None
+        self.__window_counts = {}
+        self.__rates = {}
+        self.__local = local()
+        self.__lock = Lock()
+
+    def register(self, name: str = None, stall_after: float = 10.0,
+                 thread=None) -> TMCHeartbeat:
+        """Reserves a slot for a thread. Only registration takes a lock,
+            so threads should register once, before their loop.
+
+            :param name: The name to report the thread under, defaults
+                to the thread's name.
+            :param stall_after: Seconds without a beat after which the
+                thread is reported as stalled.
+            :param thread: The threading.Thread that will beat,
+                defaults to the calling thread.
+            :returns: The TMCHeartbeat.
+        """
+
+        thread = thread or current_thread()
+        with self.__lock:
+            self.__reclaim()
+            if self.__free:
+                slot = self.__free.pop()
+            else:
+                slot = len(self.__slots)
+                self.__slots.append(None)
+                if slot % PAGE_SIZE == 0:
+                    self.__pages.append((
+                        array('d', bytes(8 * PAGE_SIZE)),
+                        array('Q', bytes(8 * PAGE_SIZE)),
+                    ))
+
+            last, count = self.__pages[slot // PAGE_SIZE]
+            index = slot % PAGE_SIZE
+            last[index] = time.monotonic()
+            count[index] = 0
+            heartbeat = TMCHeartbeat(
+                slot,
+                name or thread.name,
+                stall_after,
+                thread,
+                last,
+                count,
+                index,
+            )
+
+            self.__slots[slot] = heartbeat
+
+        if thread is current_thread():
+            self.__local.heartbeat = heartbeat
+
+        return heartbeat
+
+    def unregister(self, heartbeat: TMCHeartbeat):
+        """Frees the slot of a thread that stops beating on purpose,
+            e.g. when it exits. Later beats are ignored. When called
+            from another thread than the heartbeat's, the slot is only
+            reused once that thread beat again or exited.
+
+            :param heartbeat: The TMCHeartbeat returned by register.
+        """
+
+        with self.__lock:
+            if self.__slots[heartbeat.slot] is not heartbeat:
+                raise AssertionError(
+                    "Invariant violation: heartbeat {} is not "
+                    "registered.".format(heartbeat.name)
+                )
+
+            self.__slots[heartbeat.slot] = None
+            heartbeat.detach()
+            # The owner may be in the middle of a beat on the slot.
+            if heartbeat.thread is current_thread():
+                self.__free.append(heartbeat.slot)
+            else:
+                self.__retired.append(heartbeat)
+
+    def __reclaim(self):
+        """Frees the slots of retired heartbeats whose threads can no
+            longer write to them, called with the lock held.
+        """
+
+        retired = []
+        for heartbeat in self.__retired:
+            if heartbeat.quiescent:
+                self.__free.append(heartbeat.slot)
+            else:
+                retired.append(heartbeat)
+
+        self.__retired = retired
+
+    def beat(self):
+        """Beats for the calling thread, registering it with the
+            defaults on first use. Holding on to the TMCHeartbeat from
+            register and calling its beat is slightly cheaper.
+        """
+
+        heartbeat = getattr(self.__local, "heartbeat", None)
+        if heartbeat is None:
+            heartbeat = self.register()
+
+        heartbeat.beat()
+
+    def __roll_window(self, heartbeats: list, now: float):
+        """Measures the rates once the window has passed, called with
+            the lock held.
+        """
+
+        start = self.__window_start
+        if start is not None and now - start < self.window:
+            return
+
+        counts = {heartbeat: heartbeat.count for heartbeat in heartbeats}
+        if start is not None:
+            self.__rates = {
+                heartbeat: (count - self.__window_counts[heartbeat])
+                / (now - start)
+                for heartbeat, count in counts.items()
+                if heartbeat in self.__window_counts
+            }
+
+        self.__window_start = now
+        self.__window_counts = counts
+
+    def report(self) -> dict:
+        """Reports on every registered thread: seconds since its last
+            beat, beats per second over the last complete window (None
+            until there is one) and whether it is stalled or dead.
+
+            :returns: Dict with the overall 'status', 'ok' or
+                'stalled', and the list of 'threads'.
+        """
+
+        with self.__lock:
+            now = time.monotonic()
+            heartbeats = [
+                heartbeat for heartbeat in self.__slots
+                if heartbeat is not None
+            ]
+
+            self.__roll_window(heartbeats, now)
+            rates = self.__rates
+
+        threads = []
+        for heartbeat in heartbeats:
+            age = now - heartbeat.last_beat
+            rate = rates.get(heartbeat)
+            threads.append({
+                "name": heartbeat.name,
+                "ident": heartbeat.thread.ident,
+                "alive": heartbeat.thread.is_alive(),
+                "age": round(age, 3),
+                "beats": heartbeat.count,
+                "rate": None if rate is None else round(rate, 3),
+                "stall_after": heartbeat.stall_after,
+                "stalled": age > heartbeat.stall_after,
+            })
+
+        stalled = any(thread["stalled"] for thread in threads)
+        return {
+            "status": "stalled" if stalled else "ok",
+            "threads": threads,
+        }
@@ -0,0 +1,349 @@
+"""
+.. py:module:: tmc_http_server.memory
+    :platform: *nix
+    :synopsis: tracemalloc snapshots of the application the server is
+        running in, to chase slow memory growth in long-running
+        processes without restarting them under a profiler.
+"""
+import itertools
+import tracemalloc
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from threading import Lock
+
+from .tmc_http_server import json_response
+
+# Ways of grouping allocations, as accepted by tracemalloc.
+KEY_TYPES = ("filename", "lineno", "traceback")
+
+# Upper bound of the seconds a request waits for a comparison, the
+# point of running them in the background is not to tie up requests.
+MAX_WAIT = 10.0
+
+# Allocations made by tracemalloc itself are noise.
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class UnknownSnapshotError(KeyError):
+    """Exception raised when a snapshot name is not known, either
+        because it was never taken or because it was evicted.
+    """
+
+
+class UnknownJobError(KeyError):
+    """Exception raised when a job id is not known."""
+
+
+def format_stat(stat, key_type: str) -> dict:
+    """Turns a tracemalloc Statistic or StatisticDiff into a dict.
+
+        :param stat: The statistic.
+        :param key_type: How the statistics were grouped.
+        :returns: The dict.
+    """
+
+    entry = {"size": stat.size, "count": stat.count}
+    if key_type == "traceback":
+        entry["traceback"] = [
+            "{}:{}".format(frame.filename, frame.lineno)
+            for frame in stat.traceback
+        ]
+
+    else:
+        frame = stat.traceback[0]
+        entry["file"] = frame.filename
+        if key_type == "lineno":
+            entry["line"] = frame.lineno
+
+    if isinstance(stat, tracemalloc.StatisticDiff):
+        entry["size_diff"] = stat.size_diff
+        entry["count_diff"] = stat.count_diff
+
+    return entry
+
+
+class TMCMemoryProfiler:
+    """Keeps named tracemalloc snapshots and compares them on a
+        background thread, as grouping and diffing snapshots of a big
+        heap takes long enough to tie up a request thread.
+
+        :param max_snapshots: Number of snapshots kept, the oldest is
+            dropped when another one is taken.
+        :param max_jobs: Number of finished comparisons kept for
+            retrieval.
+    """
+
+    def __init__(self, max_snapshots: int = 8, max_jobs: int = 16):
+        """Initializer for TMCMemoryProfiler"""
+
+        self.max_snapshots = max_snapshots
+        self.max_jobs = max_jobs
+        self.__snapshots = OrderedDict()
+        self.__jobs = OrderedDict()
+        self.__job_ids = itertools.count(1)
+        self.__pool = None
+        self.__lock = Lock()
+
+    @property
+    def tracing(self) -> bool:
+        """Whether tracemalloc is tracing allocations."""
+
+        return tracemalloc.is_tracing()
+
+    @property
+    def snapshots(self) -> list:
+        """Names of the stored snapshots, oldest first."""
+
+        with self.__lock:
+            return list(self.__snapshots)
+
+    def start(self, frames: int = 1):
+        """Starts tracing allocations. Costs memory and CPU on every
+            allocation until stopped.
+
+            :param frames: Number of frames stored per allocation,
+                more than 1 is only useful for grouping by traceback.
+        """
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+        return self
+
+    def stop(self):
+        """Stops tracing and discards all stored snapshots."""
+
+        tracemalloc.stop()
+        with self.__lock:
+            self.__snapshots.clear()
+
+        return self
+
+    def take_snapshot(self, name: str):
+        """Takes and stores a snapshot, replacing any with that name.
+
+            :param name: The name to store the snapshot under.
+            :raises RuntimeError: If tracemalloc isn't tracing.
+        """
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        with self.__lock:
+            self.__snapshots.pop(name, None)
+            self.__snapshots[name] = snapshot
+            while len(self.__snapshots) > self.max_snapshots:
+                self.__snapshots.popitem(last=False)
+
+        return self
+
+    def get_snapshot(self, name: str):
+        """Looks up a stored snapshot.
+
+            :param name: The name of the snapshot.
+            :raises UnknownSnapshotError: If there's no such snapshot.
+        """
+
+        with self.__lock:
+            try:
+                return self.__snapshots[name]
+            except KeyError:
+                raise UnknownSnapshotError(name) from None
+
+    def top(self, name: str, limit: int = 20, key_type: str = "lineno"):
+        """Computes the biggest allocation sites in a snapshot.
+
+            :param name: The name of the snapshot.
+            :param limit: The number of sites to return.
+            :param key_type: One of KEY_TYPES.
+            :returns: List of dicts, see format_stat.
+        """
+
+        stats = self.get_snapshot(name).statistics(key_type)
+        return [format_stat(stat, key_type) for stat in stats[:limit]]
+
+    def diff(self, old: str, new: str, limit: int = 20,
+             key_type: str = "lineno"):
+        """Computes the allocation sites that grew or shrank most
+            between two snapshots.
+
+            :param old: The name of the earlier snapshot.
+            :param new: The name of the later snapshot.
+            :param limit: The number of sites to return.
+            :param key_type: One of KEY_TYPES.
+            :returns: List of dicts, see format_stat.
+        """
+
+        stats = self.get_snapshot(new).compare_to(
+            self.get_snapshot(old),
+            key_type,
+        )
+
+        return [format_stat(stat, key_type) for stat in stats[:limit]]
+
+    def submit(self, func, *args) -> int:
+        """Runs one of the comparisons on the background thread.
+
+            :param func: The bound method, e.g. self.top.
+            :param args: Its arguments.
+            :returns: The job id.
+        """
+
+        with self.__lock:
+            if self.__pool is None:
+                self.__pool = ThreadPoolExecutor(
+                    max_workers=1,
+                    thread_name_prefix="tmc-memory",
+                )
+
+            job_id = next(self.__job_ids)
+            self.__jobs[job_id] = self.__pool.submit(func, *args)
+            while len(self.__jobs) > self.max_jobs:
+                self.__jobs.popitem(last=False)
+
+        return job_id
+
+    def result(self, job_id: int, timeout: float = None):
+        """Waits for the result of a job.
+
+            :param job_id: The id returned by submit.
+            :param timeout: Seconds to wait, None to wait until done.
+            :returns: The result of the job.
+            :raises concurrent.futures.TimeoutError: If the job isn't
+                done in time.
+            :raises UnknownJobError: If there's no such job.
+        """
+
+        with self.__lock:
+            try:
+                future = self.__jobs[job_id]
+            except KeyError:
+                raise UnknownJobError(job_id) from None
+
+        return future.result(timeout)
+
+
+def parse_number(value, convert=int, minimum=0, maximum=None):
+    """Converts a query parameter, rejecting values out of range.
+
+        :param value: The parameter value.
+        :param convert: int or float.
+        :param minimum: The smallest valid value.
+        :param maximum: The largest valid value, None for no limit.
+        :returns: The number, or None if the value is invalid.
+    """
+
+    try:
+        value = convert(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+    if not value >= minimum or (maximum is not None and value > maximum):
+        return None
+
+    return value
+
+
+def memory_routes(profiler: TMCMemoryProfiler, route: str, authorize,
+                  wait: float) -> list:
+    """Builds the routes for TMCServer.enable_memory_profiling, see
+        there.
+
+        :returns: Argument tuples for TMCServer.add_url_handles.
+    """
+
+    if parse_number(wait, float, maximum=MAX_WAIT) is None:
+        raise AssertionError(
+            "Invariant violation: wait must be between 0 and {} "
+            "seconds.".format(MAX_WAIT)
+        )
+
+    def status():
+        return json_response({
+            "tracing": profiler.tracing,
+            "traced_memory": tracemalloc.get_traced_memory(),
+            "snapshots": profiler.snapshots,
+        })
+
+    def invalid(name):
+        return json_response({"error": "Invalid {}".format(name)}, 400)
+
+    def start(frames=1):
+        frames = parse_number(frames, minimum=1)
+        if frames is None:
+            return invalid("frames")
+
+        profiler.start(frames)
+        return status()
+
+    def stop():
+        profiler.stop()
+        return status()
+
+    def snapshot(name):
+        if not profiler.tracing:
+            return json_response({"error": "Not tracing"}, 409)
+
+        profiler.take_snapshot(str(name))
+        return status()
+
+    def job_result(job, wait=wait):
+        job = parse_number(job)
+        wait = parse_number(wait, float, maximum=MAX_WAIT)
+        if job is None:
+            return invalid("job")
+
+        if wait is None:
+            return invalid("wait")
+
+        try:
+            return json_response({
+                "job": job,
+                "result": profiler.result(job, wait),
+            })
+
+        except FutureTimeoutError:
+            return json_response({"job": job}, 202)
+
+        except (UnknownJobError, UnknownSnapshotError) as err:
+            return json_response({"error": "Unknown {}".format(err)}, 404)
+
+    def comparison(func, args, limit, key_type, wait):
+        limit = parse_number(limit)
+        if limit is None:
+            return invalid("limit")
+
+        if parse_number(wait, float, maximum=MAX_WAIT) is None:
+            return invalid("wait")
+
+        if key_type not in KEY_TYPES:
+            return json_response({
+                "error": "key_type must be one of {}".format(KEY_TYPES),
+            }, 400)
+
+        return job_result(profiler.submit(func, *args, limit, key_type), wait)
+
+    def top(name, limit=20, key_type="lineno", wait=wait):
+        return comparison(profiler.top, (str(name),), limit, key_type, wait)
+
+    def diff(old, new, limit=20, key_type="lineno", wait=wait):
+        return comparison(
+            profiler.diff,
+            (str(old), str(new)),
+            limit,
+            key_type,
+            wait,
+        )
+
+    return [
+        (route, status, authorize),
+        (route + "/start", start, authorize, "POST"),
+        (route + "/stop", stop, authorize, "POST"),
+        (route + "/snapshot", snapshot, authorize, "POST"),
+        (route + "/top", top, authorize),
+        (route + "/diff", diff, authorize),
+        (route + "/result", job_result, authorize),
+    ]
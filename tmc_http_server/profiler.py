@@ -0,0 +1,150 @@
+"""
+.. py:module:: tmc_http_server.profiler
+    :platform: *nix
+    :synopsis: Stack dumps and a statistical sampling profiler for the
+        application the server is running in, so a slow production
+        process can be inspected without attaching anything to it.
+"""
+import sys
+import time
+import threading
+import traceback
+
+from collections import Counter
+
+# Upper bounds for a single profiling session.
+MAX_SECONDS = 60.0
+MAX_RATE = 1000.0
+
+
+class ProfilerBusyError(Exception):
+    """Exception raised when a profiling session is requested while
+        another one is still running.
+    """
+
+
+def thread_names() -> dict:
+    """Maps thread idents to thread names."""
+
+    return {thread.ident: thread.name for thread in threading.enumerate()}
+
+
+def thread_dump() -> str:
+    """Formats the current stack of every thread, like the
+        traceback of an exception.
+
+        :returns: The stack dump.
+    """
+
+    names = thread_names()
+    current = threading.get_ident()
+    sections = []
+    for ident, frame in sys._current_frames().items():
+        sections.append("Thread {} ({}){}:\n{}".format(
+            names.get(ident, "<unknown>"),
+            ident,
+            " [dump]" if ident == current else "",
+            "".join(traceback.format_stack(frame)),
+        ))
+
+    return "\n".join(sections)
+
+
+class TMCSampler:
+    """Statistical profiler sampling the stacks of all threads at a
+        fixed rate. Only one session runs at a time, as overlapping
+        sessions would skew each other and multiply the overhead.
+    """
+
+    def __init__(self):
+        """Initializer for TMCSampler"""
+
+        self.__lock = threading.Lock()
+        # Formatting a frame is the expensive part of a sample, the
+        # labels are cached per code object and line.
+        self.__labels = {}
+
+    @property
+    def busy(self) -> bool:
+        """Whether a session is running."""
+
+        return self.__lock.locked()
+
+    def label(self, frame) -> str:
+        """Formats a stack frame for collapsed-stack output.
+
+            :param frame: The frame.
+            :returns: The label, 'function (file:line)'.
+        """
+
+        key = (frame.f_code, frame.f_lineno)
+        label = self.__labels.get(key)
+        if label is None:
+            code = frame.f_code
+            label = "{} ({}:{})".format(
+                code.co_name,
+                code.co_filename,
+                frame.f_lineno,
+            ).replace(";", ":")
+            self.__labels[key] = label
+
+        return label
+
+    def sample(self, seconds: float, rate: float) -> Counter:
+        """Samples the stacks of all other threads.
+
+            :param seconds: How long to sample for.
+            :param rate: Samples per second.
+            :returns: Counter of collapsed stacks, root frame first.
+            :raises ProfilerBusyError: If a session is already running.
+        """
+
+        if not self.__lock.acquire(blocking=False):
+            raise ProfilerBusyError()
+
+        try:
+            stacks = Counter()
+            current = threading.get_ident()
+            interval = 1.0 / rate
+            deadline = time.perf_counter() + seconds
+            next_sample = time.perf_counter()
+            names = thread_names()
+            while next_sample < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == current:
+                        continue
+
+                    if ident not in names:
+                        names = thread_names()
+
+                    labels = []
+                    while frame is not None:
+                        labels.append(self.label(frame))
+                        frame = frame.f_back
+
+                    labels.append(
+                        names.get(ident, str(ident)).replace(";", ":")
+                    )
+                    stacks[";".join(reversed(labels))] += 1
+
+                next_sample += interval
+                delay = next_sample - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            return stacks
+
+        finally:
+            self.__labels.clear()
+            self.__lock.release()
+
+    def collapsed(self, seconds: float, rate: float) -> str:
+        """Samples like sample, formatted as collapsed stacks, one
+            'frame;frame;frame count' line per distinct stack, which
+            flamegraph.pl, speedscope, etc. accept directly.
+        """
+
+        return "".join(
+            "{} {}\n".format(stack, count)
+            for stack, count in self.sample(seconds, rate).most_common()
+        )
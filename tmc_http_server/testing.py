@@ -0,0 +1,187 @@
+"""
+.. py:module:: tmc_http_server.testing
+    :platform: *nix
+    :synopsis: In-memory test client for TMCServer. Requests go through
+        the same request handler as over the network, but are read
+        from and written to byte buffers instead of a socket.
+"""
+import io
+import base64
+
+from json import dumps, loads
+
+from http.client import parse_headers
+from urllib.parse import urlencode
+
+
+class _MemorySocket:
+    """Stands in for the client socket handed to the request handler.
+
+        :param request: The raw HTTP request.
+    """
+
+    def __init__(self, request: bytes):
+        """Initializer for _MemorySocket"""
+
+        self.request = request
+        self.response = bytearray()
+
+    def makefile(self, mode, buffering=None):
+        if "r" in mode:
+            return io.BytesIO(self.request)
+
+        raise io.UnsupportedOperation("Only the read side is a file")
+
+    def sendall(self, data):
+        self.response += data
+
+    def fileno(self):
+        # Makes send_file fall back to writing through wfile.
+        raise io.UnsupportedOperation("Not a real socket")
+
+    def settimeout(self, timeout):
+        pass
+
+    def gettimeout(self):
+        return None
+
+    def setsockopt(self, *args):
+        pass
+
+    def close(self):
+        pass
+
+
+class TMCTestResponse:
+    """The response to a request made with TMCTestClient.
+
+        :param status_code: The HTTP status code.
+        :param headers: The response headers, an http.client.HTTPMessage.
+        :param data: The response body.
+    """
+
+    def __init__(self, status_code: int, headers, data: bytes):
+        """Initializer for TMCTestResponse"""
+
+        self.status_code = status_code
+        self.headers = headers
+        self.data = data
+
+    @property
+    def text(self) -> str:
+        """The body decoded as UTF-8."""
+
+        return self.data.decode("utf-8")
+
+    def json(self):
+        """The body parsed as JSON."""
+
+        return loads(self.text)
+
+    @classmethod
+    def parse(cls, raw: bytes):
+        """Parses a raw HTTP response.
+
+            :param raw: The bytes written by the request handler.
+            :returns: The TMCTestResponse.
+        """
+
+        stream = io.BytesIO(raw)
+        status_line = stream.readline().decode("iso-8859-1")
+        headers = parse_headers(stream)
+        return cls(int(status_line.split()[1]), headers, stream.read())
+
+
+class TMCTestClient:
+    """Dispatches requests to a TMCHTTPServer in memory, like Flask's
+        test client. Usually created with TMCServer.test_client.
+        Requests are handled synchronously on the calling thread.
+
+        :param server: An unbound TMCHTTPServer.
+        :param client_address: Address the requests appear to come from.
+    """
+
+    def __init__(self, server, client_address=("127.0.0.1", 0)):
+        """Initializer for TMCTestClient"""
+
+        self.server = server
+        self.client_address = client_address
+
+    def open(
+            self,
+            path: str,
+            method: str = "GET",
+            params: dict = None,
+            data=None,
+            json=None,
+            headers: dict = None,
+            auth=None,
+        ) -> TMCTestResponse:
+        """Sends a request.
+
+            :param path: The path of the request, may include a query
+                string.
+            :param method: The HTTP method.
+            :param params: Query parameters to append to the path.
+            :param data: Request body. A dict is sent form-encoded,
+                anything else as is.
+            :param json: Value to send as a JSON body.
+            :param headers: Additional request headers.
+            :param auth: Tuple of username and password for HTTP Basic
+                authorization.
+            :returns: The TMCTestResponse.
+        """
+
+        all_headers = {"Host": "localhost", "Connection": "close"}
+        if params:
+            path += ("&" if "?" in path else "?") + urlencode(params)
+
+        body = b""
+        if json is not None:
+            body = dumps(json).encode()
+            all_headers["Content-Type"] = "application/json"
+
+        elif isinstance(data, dict):
+            body = urlencode(data).encode()
+            all_headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        elif data is not None:
+            body = data.encode() if isinstance(data, str) else bytes(data)
+            all_headers["Content-Type"] = "text/plain"
+
+        if body or method.upper() == "POST":
+            all_headers["Content-Length"] = str(len(body))
+
+        if auth is not None:
+            all_headers["Authorization"] = "Basic {}".format(
+                base64.b64encode("{}:{}".format(*auth).encode()).decode()
+            )
+
+        all_headers.update(headers or {})
+        request = "{} {} HTTP/1.1\r\n{}\r\n".format(
+            method.upper(),
+            path,
+            "".join(
+                "{}: {}\r\n".format(name, value)
+                for name, value in all_headers.items()
+            ),
+        ).encode("iso-8859-1") + body
+
+        connection = _MemorySocket(request)
+        self.server.RequestHandlerClass(
+            connection,
+            self.client_address,
+            self.server,
+        )
+
+        return TMCTestResponse.parse(bytes(connection.response))
+
+    def get(self, path: str, **kwargs) -> TMCTestResponse:
+        """Sends a GET request, see open."""
+
+        return self.open(path, "GET", **kwargs)
+
+    def post(self, path: str, **kwargs) -> TMCTestResponse:
+        """Sends a POST request, see open."""
+
+        return self.open(path, "POST", **kwargs)
@@ -0,0 +1,326 @@
+"""
+.. py:module:: tmc_http_server.timeseries
+    :platform: *nix
+    :synopsis: Compact in-process time series of metrics sampled on an
+        interval, so pollers can see recent history and short spikes
+        without an external time-series database. Samples live in
+        preallocated array('d') ring buffers, not as Python objects,
+        and queries are vectorized with NumPy when it is installed.
+"""
+import time
+
+from array import array
+from collections import namedtuple
+from threading import Lock
+
+from .background import TMCIntervalThread
+from .tmc_http_server import _default_error_handler
+
+try:
+    import numpy
+except ImportError:  # Optional, queries fall back to pure Python.
+    numpy = None
+
+TMCBucket = namedtuple('TMCBucket', [
+    'time',
+    'min',
+    'max',
+    'mean',
+    'count',
+])
+
+
+class TMCSeries:
+    """A fixed-size ring buffer of (timestamp, value) samples. There
+        is a single writer, the sampling thread; readers don't lock,
+        they copy the buffers and retry if a sample was written while
+        copying, which the sequence number tells them. Timestamps are
+        time.monotonic, so they stay sorted when the wall clock steps
+        back; TMCTimeSeriesStore.query converts them to the epoch.
+
+        :param name: The name of the metric.
+        :param sample: Callable returning the current value, or None
+            to skip the sample.
+        :param interval: Seconds between samples.
+        :param capacity: Number of samples kept.
+    """
+
+    def __init__(self, name: str, sample, interval: float, capacity: int):
+        """Initializer for TMCSeries"""
+
+        self.name = name
+        self.sample = sample
+        self.interval = interval
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        # Total number of samples ever written, the next slot is
+        # count % capacity.
+        self.count = 0
+        # Odd while a sample is being written, incremented before and
+        # after each write.
+        self.sequence = 0
+
+    def append(self, timestamp: float, value: float):
+        """Writes a sample, overwriting the oldest one when full.
+
+            :param timestamp: time.monotonic of the sample, never less
+                than that of the previous one.
+            :param value: The value.
+        """
+
+        slot = self.count % self.capacity
+        self.sequence += 1
+        self.times[slot] = timestamp
+        self.values[slot] = value
+        self.count += 1
+        self.sequence += 1
+
+    def snapshot(self):
+        """Copies the samples, oldest first.
+
+            :returns: Tuple of the timestamps and values arrays.
+        """
+
+        while True:
+            sequence = self.sequence
+            if sequence % 2:  # Let the writer finish.
+                time.sleep(0)
+                continue
+
+            count = self.count
+            times, values = self.times[:], self.values[:]
+            if sequence == self.sequence:
+                break
+
+        if count <= self.capacity:
+            return times[:count], values[:count]
+
+        slot = count % self.capacity
+        return times[slot:] + times[:slot], values[slot:] + values[:slot]
+
+    def downsample(self, start: float, end: float, points: int) -> list:
+        """Aggregates the samples in a time range into buckets.
+
+            :param start: Start of the range, same clock as the
+                timestamps.
+            :param end: End of the range, same clock as the timestamps.
+            :param points: Number of buckets to split the range into.
+            :returns: List of TMCBucket for the non-empty buckets.
+        """
+
+        times, values = self.snapshot()
+        width = (end - start) / points
+        if width <= 0:
+            return []
+
+        if numpy is not None:
+            return _downsample_numpy(times, values, start, end, width, points)
+
+        return _downsample_python(times, values, start, end, width, points)
+
+
+def _downsample_numpy(times, values, start, end, width, points) -> list:
+    """Vectorized implementation of TMCSeries.downsample."""
+
+    times = numpy.frombuffer(times, dtype=numpy.float64)
+    values = numpy.frombuffer(values, dtype=numpy.float64)
+    # The timestamps are sorted, so each bucket is a contiguous slice
+    # and its boundaries can be found with a binary search.
+    edges = numpy.searchsorted(
+        times,
+        start + width * numpy.arange(points + 1),
+        side="left",
+    )
+
+    edges[-1] = numpy.searchsorted(times, end, side="right")
+    values = values[:edges[-1]]
+    counts = numpy.diff(edges)
+    nonempty = numpy.flatnonzero(counts)
+    if not len(nonempty):
+        return []
+
+    starts = edges[:-1][nonempty]
+    counts = counts[nonempty]
+    mins = numpy.minimum.reduceat(values, starts)
+    maxs = numpy.maximum.reduceat(values, starts)
+    means = numpy.add.reduceat(values, starts) / counts
+    bucket_times = start + width * nonempty
+    return [
+        TMCBucket(*row) for row in zip(
+            bucket_times.tolist(),
+            mins.tolist(),
+            maxs.tolist(),
+            means.tolist(),
+            counts.tolist(),
+        )
+    ]
+
+
+def _downsample_python(times, values, start, end, width, points) -> list:
+    """Pure Python implementation of TMCSeries.downsample."""
+
+    buckets = {}
+    for timestamp, value in zip(times, values):
+        if timestamp < start or timestamp > end:
+            continue
+
+        index = min(int((timestamp - start) / width), points - 1)
+        bucket = buckets.get(index)
+        if bucket is None:
+            buckets[index] = [value, value, value, 1]
+        else:
+            bucket[0] = min(bucket[0], value)
+            bucket[1] = max(bucket[1], value)
+            bucket[2] += value
+            bucket[3] += 1
+
+    return [
+        TMCBucket(start + width * index, low, high, total / count, count)
+        for index, (low, high, total, count) in sorted(buckets.items())
+    ]
+
+
+class TMCTimeSeriesStore:
+    """Samples registered metrics on their intervals from a single
+        background thread. Sampling functions should be cheap, they
+        all share that thread.
+
+        :param tick: Seconds between scheduling passes.
+        :param on_error: Callback for errors raised by the sampling
+            functions, the sample is skipped.
+    """
+
+    def __init__(self, tick: float = 0.1, on_error=_default_error_handler):
+        """Initializer for TMCTimeSeriesStore"""
+
+        self.tick = tick
+        self.on_error = on_error
+        self.series = {}
+        self.__due = {}
+        self.__worker = TMCIntervalThread(
+            self.sample_due,
+            tick,
+            "tmc-timeseries",
+        )
+        self.__lock = Lock()
+
+    def register(
+            self,
+            name: str,
+            sample,
+            interval: float = 1.0,
+            capacity: int = 3600,
+        ):
+        """Registers a metric to sample.
+
+            :param name: The name of the metric.
+            :param sample: Callable returning the current value as a
+                number, or None to skip the sample.
+            :param interval: Seconds between samples.
+            :param capacity: Number of samples kept, the default keeps
+                an hour of history at one sample per second.
+            :returns: The TMCSeries.
+        """
+
+        with self.__lock:
+            if name in self.series:
+                raise AssertionError(
+                    "Invariant violation: metric {} already "
+                    "registered.".format(name)
+                )
+
+            series = TMCSeries(name, sample, interval, capacity)
+            self.__due[name] = 0.0
+            # Replaced rather than mutated, the sampling thread and
+            # readers iterate over it without the lock.
+            all_series = dict(self.series)
+            all_series[name] = series
+            self.series = all_series
+
+        return series
+
+    def sample_due(self):
+        """Samples the metrics that are due, called periodically on the
+            background thread.
+        """
+
+        now = time.monotonic()
+        for name, series in self.series.items():
+            if now < self.__due[name]:
+                continue
+
+            self.__due[name] = now + series.interval
+            try:
+                value = series.sample()
+                if value is not None:
+                    series.append(time.monotonic(), float(value))
+
+            except Exception as err:
+                self.on_error(err)
+
+    def query(
+            self,
+            name: str,
+            start: float = None,
+            end: float = None,
+            points: int = 100,
+        ) -> dict:
+        """Returns a time range of a metric downsampled to at most
+            points buckets with the min, max and mean of each.
+
+            :param name: The name of the metric.
+            :param start: Start of the range in seconds since the epoch,
+                or if negative relative to now. Defaults to the start
+                of the history kept.
+            :param end: End of the range, like start, defaults to now.
+            :param points: Maximum number of buckets.
+            :returns: Dict with the metric's name, interval and buckets.
+            :raises KeyError: If there is no such metric.
+        """
+
+        series = self.series[name]
+        now = time.time()
+        # The samples are timestamped with time.monotonic.
+        offset = now - time.monotonic()
+        if start is None:
+            start = -series.interval * series.capacity
+
+        if start < 0:
+            start += now
+
+        if end is None:
+            end = now
+
+        elif end < 0:
+            end += now
+
+        return {
+            "name": name,
+            "interval": series.interval,
+            "start": start,
+            "end": end,
+            "buckets": [
+                dict(bucket._asdict(), time=bucket.time + offset)
+                for bucket in series.downsample(
+                    start - offset,
+                    end - offset,
+                    points,
+                )
+            ],
+        }
+
+    def start(self):
+        """Starts the sampling thread if it isn't running."""
+
+        self.__worker.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        """Stops the sampling thread.
+
+            :param timeout: Seconds to wait for the thread.
+        """
+
+        self.__worker.stop(timeout)
+        return self
@@ -7,18 +7,33 @@
         server is no meant to e.g. handle a RESTful API backend.
         The API is inspired by Flask.
 """
+import os
 import re
 import json
-
-from typing import Union, Iterable, Tuple, Any
+import stat
+import time
+import socket
+import mimetypes
+import selectors
+import socketserver
+
+from contextlib import ExitStack
+from typing import Union, Iterable, Tuple, Any, Optional
+from types import MappingProxyType
 from collections import namedtuple
 from ipaddress import IPv4Address
-from threading import Thread
-from urllib.parse import urlparse, parse_qs
+from threading import Thread, Lock
+from urllib.parse import urlparse, parse_qs, unquote
 from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
-import magic
-from http_basic_auth import parse_header, BasicAuthException
+from .files import (
+    resolve_path,
+    parse_range,
+    send_file,
+    UnsatisfiableRangeError,
+)
+from .bulkhead import TMCBulkhead, BulkheadFullError
+from .encoding import is_structured, encode, _json_default
 
 # For those who don't like their data stringly-typed.
 HOST = Union[str, IPv4Address]
@@ -35,6 +50,15 @@ HTTP_METHODS = (
 )
 
 COMMA = r",\s*"
+
+# Seconds between checks whether TMCServer::stop has been called.
+POLL_INTERVAL = 0.1
+
+FOUR_HUNDRED = """
+<h1>HTTP 400</h1>
+<p>The request could not be understood</p>
+"""
+
 FOUR_OH_FOUR = """
 <h1>HTTP 404</h1>
 <p>The requested resource was not found</p>
@@ -45,12 +69,55 @@ FIVE_HUNDRED = """
 <p>An error occured processing your request.</p>
 """
 
+FOUR_THIRTEEN = """
+<h1>HTTP 413</h1>
+<p>The request is larger than the server is willing to process</p>
+"""
+
+FOUR_SIXTEEN = """
+<h1>HTTP 416</h1>
+<p>The requested range is not satisfiable</p>
+"""
+
 FIVE_OH_THREE = """
 <h1>503: Forbidden</h1>
 <p>The request did not contain the proper credentials
 to access this resource</p>
 """
 
+FIVE_OH_THREE_BUSY = """
+<h1>HTTP 503</h1>
+<p>Too many concurrent requests to this resource, retry later</p>
+"""
+
+
+# libmagic is loaded on first use and shared by every server, see
+# load_magic. _MAGIC is False until the first attempt and None if
+# libmagic turned out to be unavailable.
+_MAGIC = False
+_MAGIC_LOCK = Lock()
+
+
+def load_magic():
+    """Returns the shared magic.Magic instance used to guess mime
+        types, importing python-magic (and with it libmagic and its
+        database) on the first call rather than at import time.
+
+        :returns: The instance or None if libmagic is unavailable.
+    """
+
+    global _MAGIC
+    if _MAGIC is False:
+        with _MAGIC_LOCK:
+            if _MAGIC is False:
+                try:
+                    import magic
+                    _MAGIC = magic.Magic(mime=True)
+                except Exception:  # ImportError, missing libmagic, etc.
+                    _MAGIC = None
+
+    return _MAGIC
+
 
 def _default_error_handler(err: Exception) -> Exception:
     """Since the server runs in its own thread context, it
@@ -122,8 +189,6 @@ def unpack(value: Any):
 
             # Check if it only has the one element.
             if len(value) == 1:
-                temp = try_parse(first)
-                print("TEMP {}/{}".format(temp, type(temp)))
                 return try_parse(first)
 
             return [unpack(item) for item in value]
@@ -138,6 +203,24 @@ def unpack(value: Any):
     return try_parse(value)
 
 
+def parse_credentials(auth_header: str) -> Tuple[str, str]:
+    """Extracts the username and password from a HTTP Basic
+        Authorization header.
+
+        :param auth_header: The header value, may be None.
+        :returns: The username and password, both empty strings if
+            the header is missing or malformed.
+    """
+
+    from http_basic_auth import parse_header, BasicAuthException
+
+    try:
+        return parse_header(auth_header)
+
+    except BasicAuthException:
+        return "", ""
+
+
 def format_route_key(route: str, method: str) -> str:
     """Formats an HTTP verb and the associated route into
         a dictionary key.
@@ -149,6 +232,43 @@ def format_route_key(route: str, method: str) -> str:
     return "{}, {}".format(route, method.upper())
 
 
+def file_route_prefix(route: str) -> str:
+    """The prefix a file route is registered under, without a
+        trailing slash so that it matches the paths below it.
+
+        :param route: The URL prefix given for the file route.
+        :returns: The prefix.
+    """
+    return route.rstrip("/")
+
+
+def match_route(rules, path: str, method: str):
+    """Finds the route registered for a request. Handler routes
+        only match their exact path, file routes also match any
+        path below them.
+
+        :param rules: The route rules registered with the server.
+        :param path: The path of the request, without query string.
+        :param method: The HTTP method of the request.
+        :returns: A tuple of the route and, for file routes, the
+            remainder of the path below the route. (None, None) if
+            no route matches.
+    """
+
+    route = rules.get(format_route_key(path, method))
+    if route is not None:
+        return route, ""
+
+    prefix = path
+    while "/" in prefix:
+        prefix = prefix.rpartition("/")[0]
+        route = rules.get(format_route_key(prefix, method))
+        if isinstance(route, TMCFileRoute):
+            return route, path[len(prefix) + 1:]
+
+    return None, None
+
+
 class UnimplementedHTTPMethodError(Exception):
     """Exception raised when the user attempts to supply an
         unsupported HTTP verb. Since the route calls are
@@ -158,21 +278,210 @@ class UnimplementedHTTPMethodError(Exception):
     """
 
 
+# Handlers return the body of the response, or a TMCResponse if they
+# need a status other than 200 or extra headers. The Content-Type is
+# guessed from the body unless given in the headers.
+TMCResponse = namedtuple('TMCResponse', [
+    'body',
+    'status',
+    'headers',
+], defaults=(200, None))
+
+
+def json_response(value, status: int = 200) -> TMCResponse:
+    """Builds a TMCResponse with a JSON body.
+
+        :param value: The value to serialize.
+        :param status: The HTTP status code.
+        :returns: The response.
+    """
+
+    return TMCResponse(
+        json.dumps(value),
+        status,
+        {"Content-Type": "application/json"},
+    )
+
+
+# The bulkhead is None for routes without a concurrency limit.
 TMCKnownRoute = namedtuple('TMCKnownRoute', [
     'handle',
     'authenticate',
+    'bulkhead',
+], defaults=(None,))
+
+TMCFileRoute = namedtuple('TMCFileRoute', [
+    'directory',
+    'authenticate',
 ])
 
+TMCBatchRoute = namedtuple('TMCBatchRoute', [
+    'batch',
+    'authenticate',
+])
+
+
+class TMCRouteTable:
+    """The route rules shared by a TMCServer and its request
+        handlers. The rules are an immutable mapping that is
+        replaced as a whole on every change, so request threads
+        read it without locking and never see a half-updated
+        table. Writers are serialized by a lock.
+
+        :param rules: The initial route rules.
+    """
+
+    def __init__(self, rules=None):
+        """Initializer for TMCRouteTable"""
+
+        self.rules = MappingProxyType(dict(rules or {}))
+        self.__lock = Lock()
+
+    def update(self, additions=(), removals=()):
+        """Swaps in a copy of the rules with routes added and removed.
+            Nothing changes if the update is invalid.
+
+            :param additions: Iterable of (key, route) tuples to add.
+            :param removals: Iterable of keys to remove.
+            :returns: The new rules.
+        """
+
+        with self.__lock:
+            rules = dict(self.rules)
+            for key in removals:
+                if rules.pop(key, None) is None:
+                    raise AssertionError(
+                        """
+                        Invariant violation: no handler registered for {}.
+                        """.format(key)
+                    )
+
+            for key, route in additions:
+                if key in rules:
+                    raise AssertionError(
+                        """
+                        Invariant violation: handler already registered
+                        for {}.
+                        """.format(key)
+                    )
+
+                rules[key] = route
+
+            self.rules = MappingProxyType(rules)
+
+        return self.rules
+
 
 class TMCRequestHandler(BaseHTTPRequestHandler):
     """Default request handler."""
 
+    # Set when the request line has been read, for access logging.
+    request_started = None
+
+    # The TMCTrace of the request if the server traces requests.
+    trace = None
+
+    def parse_request(self) -> bool:
+        """Override of BaseHTTPRequestHandler::parse_request that
+            notes when the request started, and starts its trace.
+        """
+
+        self.request_started = time.perf_counter()
+        self.trace = None
+        tracer = self.server.tracer
+        if tracer is None:
+            return super(TMCRequestHandler, self).parse_request()
+
+        started = time.perf_counter_ns()
+        parsed = super(TMCRequestHandler, self).parse_request()
+        if parsed:
+            self.trace = tracer.start(
+                "{} {}".format(self.command, self.path.split("?")[0]),
+                self.headers.get("traceparent"),
+                started,
+            )
+
+            self.trace.mark("parse")
+
+        return parsed
+
+    def handle_one_request(self):
+        """Override of BaseHTTPRequestHandler::handle_one_request that
+            finishes the request's trace.
+        """
+
+        try:
+            super(TMCRequestHandler, self).handle_one_request()
+
+        finally:
+            trace, self.trace = self.trace, None
+            if trace is not None:
+                self.server.tracer.finish(trace)
+
+    def mark(self, phase: str):
+        """Ends a phase of the request's trace, if it is traced.
+
+            :param phase: The name of the phase.
+        """
+
+        if self.trace is not None:
+            self.trace.mark(phase)
+
+    def end_headers(self):
+        """Override of BaseHTTPRequestHandler::end_headers that adds
+            the phases of traced requests as a Server-Timing header.
+        """
+
+        if self.trace is not None:
+            self.send_header("Server-Timing", self.trace.server_timing())
+
+        super(TMCRequestHandler, self).end_headers()
+
+    def log_request(self, code="-", size="-"):
+        """Override of BaseHTTPRequestHandler::log_request that hands
+            the request to the server's access logger, if it has one,
+            instead of writing to stderr on the request thread.
+        """
+
+        if self.trace is not None:
+            self.trace.status = int(code)
+
+        access_logger = self.server.access_logger
+        if access_logger is None:
+            super(TMCRequestHandler, self).log_request(code, size)
+            return
+
+        started = self.request_started or time.perf_counter()
+        access_logger.log(
+            self.client_address[0],
+            self.command,
+            getattr(self, "path", ""),
+            int(code),
+            time.perf_counter() - started,
+        )
+
     def handle_unauthorized_request(self):
         self.send_response(503)
         self.send_header("Content-Type", "text/html")
         self.end_headers()
         self.wfile.write(FIVE_OH_THREE.encode())
 
+    def handle_bad_request(self):
+        """Handles requests with a body we can't make sense of."""
+
+        self.send_response(400)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(FOUR_HUNDRED.encode())
+
+    def handle_request_too_large(self):
+        """Handles requests exceeding a configured limit."""
+
+        self.send_response(413)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(FOUR_THIRTEEN.encode())
+
     def handle_unknown_route(self):
         """Handles requests we don't have a registered route for."""
 
@@ -181,6 +490,24 @@ class TMCRequestHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(FOUR_OH_FOUR.encode())
 
+    def handle_unsatisfiable_range(self, size: int):
+        """Handles Range requests that lie outside of the file."""
+
+        self.send_response(416)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Range", "bytes */{}".format(size))
+        self.end_headers()
+        self.wfile.write(FOUR_SIXTEEN.encode())
+
+    def handle_route_busy(self):
+        """Handles requests to a route whose bulkhead is full."""
+
+        self.send_response(503)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(FIVE_OH_THREE_BUSY.encode())
+
     def handle_internal_error(self):
         """Returns a generic 500 response to the client."""
 
@@ -191,7 +518,8 @@ class TMCRequestHandler(BaseHTTPRequestHandler):
 
     def guess_mime_type(self, string: str) -> str:
         """Attempts to guess the mime type of the result using
-            libmagic.
+            libmagic, falling back to text/plain if libmagic is
+            not installed.
 
             :param string: The string to infer the mime type for.
             :returns: Best guess as to the mime type.
@@ -200,31 +528,174 @@ class TMCRequestHandler(BaseHTTPRequestHandler):
         # Yeah, yeah, Law of Demeter and whatnot. Singleton
         # reference that is immutable by convention, not going
         # to bother with a pass-thru method.
-        return self.server.magic.from_buffer(string)
+        magic_instance = self.server.magic
+        if magic_instance is None:
+            return "text/plain"
+
+        return magic_instance.from_buffer(string)
     
     def authorize(self, auth_header, auth_fn) -> bool:
-        """"""
+        """Checks the credentials in the Authorization header
+            against the route's authorization function, sending
+            a 503 if they are rejected.
 
-        try:
-            username, password = parse_header(auth_header)
-        
-        except BasicAuthException:
-            username, password = "", ""
-        
+            :param auth_header: The value of the Authorization header.
+            :param auth_fn: The route's authorization function.
+            :returns: Whether the request may proceed.
+        """
+
+        # Most routes are public, no need to parse the header.
+        if auth_fn is yes:
+            return True
+
+        username, password = parse_credentials(auth_header)
         auth = auth_fn(username, password)
         if not auth:
             self.handle_unauthorized_request()
 
         return auth
     
-    def is_known_route(self, string: str) -> bool:
-        """"""
+    def call_route(self, route: TMCKnownRoute, *args, **kwargs):
+        """Calls a route's handler within the route's bulkhead.
+
+            :param route: The matched route.
+            :returns: The handler's return value.
+            :raises BulkheadFullError: If the bulkhead is full.
+        """
+
+        if route.bulkhead is None:
+            return route.handle(*args, **kwargs)
+
+        with route.bulkhead:
+            return route.handle(*args, **kwargs)
+
+    def send_result(self, result):
+        """Sends the value returned by a route handler to the client.
+            Dicts, lists and NumPy arrays are encoded as JSON, or as
+            MessagePack or CBOR if the Accept header asks for it.
+
+            :param result: The handler's return value, either the body
+                or a TMCResponse.
+        """
+
+        status, headers = 200, {}
+        if isinstance(result, TMCResponse):
+            result, status, headers = result.body, result.status, (
+                result.headers or {}
+            )
+
+        if "Content-Type" not in headers and is_structured(result):
+            body, content_type = encode(result, self.headers.get("Accept"))
+            headers = dict(headers)
+            headers["Content-Type"] = content_type
+            headers["Vary"] = "Accept"
+
+        else:
+            body = str(result).encode()
+            if "Content-Type" not in headers:
+                headers = dict(headers)
+                headers["Content-Type"] = self.guess_mime_type(result)
+
+        self.mark("encode")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+
+        self.end_headers()
+        self.wfile.write(body)
+        self.mark("write")
+
+    def serve_file(self, route: TMCFileRoute, relative: str):
+        """Sends a file below a file route's directory, honoring a
+            single byte range in the Range header.
 
-        known = string in self.server.route_rules
-        if not known:
+            :param route: The matched file route.
+            :param relative: The path of the file below the route.
+        """
+
+        filename = resolve_path(route.directory, unquote(relative))
+        if filename is None:
             self.handle_unknown_route()
-        
-        return known
+            return
+
+        try:
+            fileobj = open(filename, "rb")
+        except OSError:
+            self.handle_unknown_route()
+            return
+
+        with fileobj:
+            size = os.fstat(fileobj.fileno()).st_size
+            try:
+                byte_range = parse_range(self.headers.get("Range"), size)
+            except UnsatisfiableRangeError:
+                self.handle_unsatisfiable_range(size)
+                return
+
+            mime_type = mimetypes.guess_type(filename)[0]
+            if byte_range is None:
+                start, end = 0, size - 1
+                self.send_response(200)
+            else:
+                start, end = byte_range
+                self.send_response(206)
+                self.send_header(
+                    "Content-Range",
+                    "bytes {}-{}/{}".format(start, end, size),
+                )
+
+            self.send_header(
+                "Content-Type",
+                mime_type or "application/octet-stream",
+            )
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Accept-Ranges", "bytes")
+            self.end_headers()
+            send_file(
+                self.connection,
+                self.wfile,
+                fileobj,
+                start,
+                end - start + 1,
+            )
+
+    def serve_batch(self, rules, route: TMCBatchRoute):
+        """Executes the sub-requests in the JSON body of a batch
+            request and sends their results as one JSON array.
+
+            :param rules: The route rules the request was matched
+                against, the sub-requests use the same table.
+            :param route: The matched batch route.
+        """
+
+        content_length = int(self.headers.get("Content-Length", 0))
+        try:
+            requests = json.loads(
+                self.rfile.read(content_length).decode("utf-8")
+            )
+
+        except ValueError:  # Covers JSON and unicode decoding errors.
+            requests = None
+
+        if not isinstance(requests, list):
+            self.handle_bad_request()
+            return
+
+        if len(requests) > route.batch.max_requests:
+            self.handle_request_too_large()
+            return
+
+        username, password = parse_credentials(
+            self.headers.get("Authorization")
+        )
+
+        results = route.batch.execute(rules, requests, username, password)
+        body = json.dumps(results, default=_json_default).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
     def do_GET(self):
         """Handles HTTP GET requests by calling the function
@@ -232,83 +703,107 @@ class TMCRequestHandler(BaseHTTPRequestHandler):
         """
 
         path = self.path.split("?")[0]
-        key = format_route_key(path, self.command)
-        known = self.is_known_route(key)
-        if known:
-            route = self.server.route_rules[key]
-            authed = self.authorize(
-                self.headers.get("Authorization"),
-                route.authenticate,
-            )
+        route, relative = match_route(
+            self.server.route_rules,
+            path,
+            self.command,
+        )
+
+        self.mark("route")
+        if route is None:
+            self.handle_unknown_route()
+            return
+
+        authed = self.authorize(
+            self.headers.get("Authorization"),
+            route.authenticate,
+        )
+
+        self.mark("authorize")
+        if authed and isinstance(route, TMCFileRoute):
+            try:
+                self.serve_file(route, relative)
+                self.mark("write")
+            except Exception as err:
+                # Headers are likely already sent, all we can do is
+                # report the error and let the client notice the
+                # short read.
+                self.server.on_error(err)
+
+        elif authed:
+            try:
+                query_params = unpack(
+                    parse_qs(urlparse(self.path).query)
+                )
 
-            if authed:
-                try:
-                    query_params = unpack(
-                        parse_qs(urlparse(self.path).query)
-                    )
+                self.mark("unpack")
+                result = self.call_route(route, **query_params)
+                self.mark("handler")
+                self.send_result(result)
 
-                    result = route.handle(**query_params)
-                    mime_type = self.guess_mime_type(result)
-                    self.send_response(200)
-                    self.send_header("Content-Type", mime_type)
-                    self.end_headers()
-                    self.wfile.write(str(result).encode())
+            except BulkheadFullError:
+                self.handle_route_busy()
 
-                except Exception as err:
-                    self.server.on_error(err)
-                    self.handle_internal_error()
+            except Exception as err:
+                self.server.on_error(err)
+                self.handle_internal_error()
 
     def do_POST(self):
         """Handles POST requests."""
 
         key = format_route_key(self.path, self.command)
-        known = self.is_known_route(key)
-        if known:
-            route = self.server.route_rules[key]
+        rules = self.server.route_rules
+        route = rules.get(key)
+        self.mark("route")
+        if route is None:
+            self.handle_unknown_route()
+
+        else:
             authed = self.authorize(
                 self.headers.get("Authorization"),
                 route.authenticate,
             )
 
-            if authed:
+            self.mark("authorize")
+            if authed and isinstance(route, TMCBatchRoute):
                 try:
-                    content_length = self.headers.get("Content-Length", 0)
-                    content_type = self.headers.get("Content-Type")
-                    print("CONTENT {} {}".format(content_type, content_length))
+                    self.serve_batch(rules, route)
+                    self.mark("batch")
+                except Exception as err:
+                    self.server.on_error(err)
+                    self.handle_internal_error()
+
+            elif authed:
+                try:
+                    content_length = int(self.headers.get("Content-Length", 0))
+                    content_type = self.headers.get("Content-Type", "")
+                    body = self.rfile.read(content_length).decode("utf-8")
+                    self.mark("read")
 
                     # Here we'll try to handle the body if it's there based
                     # on the content-type header if present. Currently we're
                     # only handling url-encoded form data, json data, and plain text
                     # because again, this is just a basic server for monitoring
                     # a Python application.
+                    args, kwargs = (), {}
                     if "application/json" in content_type:
-                        body = self.rfile.read(int(content_length)).decode("utf-8")
-                        kwargs = json.loads(body) or {}
-                        result = route.handle(**kwargs)
+                        kwargs = json.loads(body or "null") or {}
 
                     elif "application/x-www-form-urlencoded" in content_type:
-                        body = self.rfile.read(int(content_length)).decode("utf-8")
-                        print(body)
-                        print(parse_qs(body))
-                        query_params = unpack(
+                        kwargs = unpack(
                             parse_qs(body)
                         )
 
-                        print(query_params)
-
-                        result = route.handle(**query_params)
-
                     elif body:  # Assume it's a string and the handler will accept
-                        result = route.handle(body)
+                        args = (body,)
 
-                    else:
-                        result = route.handle()
+                    self.mark("unpack")
+                    result = self.call_route(route, *args, **kwargs)
+                    self.mark("handler")
+                    self.send_result(result)
 
-                    mime_type = self.guess_mime_type(result)
-                    self.send_response(200)
-                    self.send_header("Content-Type", mime_type)
-                    self.end_headers()
-                    self.wfile.write(str(result).encode())
+                except BulkheadFullError:
+                    self.handle_route_busy()
 
                 except Exception as err:
                     self.server.on_error(err)
@@ -321,23 +816,41 @@ class TMCServer(Thread):
 
         :param host: The fully-qualified domain name or IP
             address of the server, defualts to '0.0.0.0'.
-        :param port: The port number, defaults to 8080.
+        :param port: The port number, defaults to 8080. None to only
+            serve on unix_socket, which is then required.
         :param handler: The request handler, defaults to
             TMCRequestHandler.
         :param on_error: Because the actual HTTP server runs in
             a separate thread, the caller can pass a callback
             here to receive errors that arise during requests.
+        :param access_logger: Optional TMCAccessLogger, by default
+            requests are logged to stderr on the request thread.
+        :param unix_socket: Optional filesystem path of a Unix domain
+            socket to serve on as well, e.g. for a scrape agent on the
+            same host. Names starting with '@' are put in the Linux
+            abstract namespace instead of the filesystem.
+        :param unix_socket_mode: File permissions of the Unix domain
+            socket, defaults to owner only.
     """
 
     def __init__(
             self,
             host: HOST = "0.0.0.0",
-            port: int = 8080,
+            port: Optional[int] = 8080,
             handler=TMCRequestHandler,
             on_error=_default_error_handler,
+            access_logger=None,
+            unix_socket: Optional[str] = None,
+            unix_socket_mode: int = 0o600,
         ):
         """Initializer for TMCHTTPServer"""
 
+        if port is None and unix_socket is None:
+            raise AssertionError(
+                "Invariant violation: server needs a port or a "
+                "unix_socket to serve on."
+            )
+
         super(TMCServer, self).__init__()
         self.daemon = True
 
@@ -346,12 +859,69 @@ class TMCServer(Thread):
         self.port = port
         self.host = host
         self.address = (str(host), port)
+        self.unix_socket = unix_socket
+        self.unix_socket_mode = unix_socket_mode
 
         self.__serving = False
         self.__handler = handler
-        self.__route_rules = {}
+        self.__routes = TMCRouteTable()
         self.__on_error = on_error
-        self.__magic = magic.Magic(mime=True)
+        self.__access_logger = access_logger
+        self.__tracer = None
+        self.__health = None
+        self.__heartbeats = None
+        self.__timeseries = None
+        # Components with background threads that run while serving.
+        self.__background = []
+        if access_logger is not None:
+            if access_logger.on_error is None:
+                access_logger.on_error = on_error
+
+            self.__add_background(access_logger)
+
+    def __url_handle_rules(
+            self,
+            route,
+            handler,
+            authorize=yes,
+            methods: VERBS = "GET",
+            max_concurrency: Optional[int] = None,
+            queue_timeout: Optional[float] = 0.0,
+            max_queue: Optional[int] = None,
+        ):
+        """Builds the route rules for add_url_handle without
+            registering them, see there.
+
+            :returns: A list of (key, TMCKnownRoute) tuples.
+        """
+
+        mthds = methods
+        if isinstance(methods, str):
+            mthds = list(re.split(COMMA, methods))
+
+        # One bulkhead for all of the route's methods.
+        bulkhead = None
+        if max_concurrency is not None:
+            bulkhead = TMCBulkhead(
+                route,
+                max_concurrency,
+                queue_timeout,
+                max_queue,
+            )
+
+        rules = []
+        for method in mthds:
+            if method.upper() not in HTTP_METHODS:
+                raise UnimplementedHTTPMethodError(
+                    "TMCServer does not implement HTTP method {}".format(
+                        method
+                    )
+                )
+
+            key = format_route_key(route, method)
+            rules.append((key, TMCKnownRoute(handler, authorize, bulkhead)))
+
+        return rules
 
     def add_url_handle(
             self,
@@ -359,49 +929,544 @@ class TMCServer(Thread):
             handler,
             authorize=yes,
             methods: VERBS = "GET",
+            max_concurrency: Optional[int] = None,
+            queue_timeout: Optional[float] = 0.0,
+            max_queue: Optional[int] = None,
         ):
         """Registers the handler for the given route and HTTP
             verb. Although it can be called directly, it is likely
-            more convenient to use the route decorator.
+            more convenient to use the route decorator. Routes can
+            be added while the server is running, requests already
+            in flight keep using the previous route table.
 
             :param route: The URL to register.
             :param handler: The handler function for that route.
             :param authorize: Authorization function, given the username
                 and password from the Authorization header.
             :param methods: The HTTP verbs that the route is valid for.
+            :param max_concurrency: Maximum number of concurrent calls
+                to the handler, by default there is no limit. Requests
+                beyond it are answered with a 503, see TMCBulkhead.
+            :param queue_timeout: Seconds a request waits for one of
+                the max_concurrency slots, 0 to reject it right away
+                and None to wait indefinitely.
+            :param max_queue: Maximum number of requests waiting for a
+                slot, None for no limit.
             :returns: self.
         """
 
-        if self.__serving:
-            # Technically we could allow this, but it isn't worth the
-            # effort of tracking down subtle bugs from dynamically added
-            # routes.
-            raise AssertionError(
-                "Invariant violation: cannot add route while server is running."
-            )
+        self.__routes.update(self.__url_handle_rules(
+            route,
+            handler,
+            authorize,
+            methods,
+            max_concurrency,
+            queue_timeout,
+            max_queue,
+        ))
+
+        return self
+
+    def add_url_handles(self, handles):
+        """Registers many handlers at once, swapping the route table
+            only once. Either all of the handlers are registered or,
+            if any of them is invalid, none of them are.
+
+            :param handles: Iterable of argument tuples or keyword
+                argument dicts for add_url_handle.
+            :returns: self.
+        """
+
+        rules = []
+        for handle in handles:
+            if isinstance(handle, dict):
+                rules.extend(self.__url_handle_rules(**handle))
+            else:
+                rules.extend(self.__url_handle_rules(*handle))
+
+        self.__routes.update(rules)
+        return self
+
+    def remove_url_handle(self, route, methods: VERBS = "GET"):
+        """Unregisters the handler for the given route and HTTP
+            verbs, including file routes, which are registered
+            for GET.
+
+            :param route: The URL to unregister.
+            :param methods: The HTTP verbs to unregister the route for.
+            :returns: self.
+        """
 
         mthds = methods
         if isinstance(methods, str):
             mthds = list(re.split(COMMA, methods))
 
+        rules = self.__routes.rules
+        removals = []
         for method in mthds:
-            if method.upper() not in HTTP_METHODS:
-                raise UnimplementedHTTPMethodError(
-                    "TMCServer does not implement HTTP method {}".format(
-                        method
-                    )
+            key = format_route_key(route, method)
+            file_key = format_route_key(file_route_prefix(route), method)
+            if key not in rules and isinstance(
+                    rules.get(file_key), TMCFileRoute):
+                key = file_key
+
+            removals.append(key)
+
+        self.__routes.update(removals=removals)
+
+        return self
+
+    def enable_batch(
+            self,
+            route="/_batch",
+            authorize=yes,
+            max_requests: int = 32,
+            max_workers: int = 4,
+        ):
+        """Adds a POST route that executes several route calls in one
+            request. The body is a JSON list of objects with the keys
+            'route', 'method' (defaults to GET) and 'params' (keyword
+            arguments for the handler). Every sub-request is checked
+            against its own route's authorization function with the
+            credentials of the batch request. The response is a JSON
+            list of objects with the 'status' and 'body' of each
+            sub-request, in order.
+
+            :param route: The URL to register.
+            :param authorize: Authorization function for the batch
+                route itself.
+            :param max_requests: Maximum number of sub-requests per
+                batch, larger batches are answered with a 413.
+            :param max_workers: Number of threads executing the
+                sub-requests, shared by all batch requests.
+            :returns: self.
+        """
+
+        from .batch import TMCBatch
+
+        batch = TMCBatch(max_requests, max_workers, self.__on_error)
+        self.__routes.update([(
+            format_route_key(route, "POST"),
+            TMCBatchRoute(batch, authorize),
+        )])
+
+        return self
+
+    def enable_access_log_route(self, route="/_access_log", authorize=yes):
+        """Adds a GET route returning the most recent access log
+            records as JSON. Accepts the query parameters 'limit'
+            (defaults to 100) and 'status' to filter by status code.
+
+            :param route: The URL to register.
+            :param authorize: Authorization function, given the username
+                and password from the Authorization header.
+            :returns: self.
+        """
+
+        access_logger = self.__access_logger
+        if access_logger is None:
+            raise AssertionError(
+                "Invariant violation: server has no access logger."
+            )
+
+        def recent_requests(limit=100, status=None):
+            try:
+                limit = int(limit)
+                status = None if status is None else int(status)
+            except (TypeError, ValueError):
+                limit = -1
+
+            if limit < 0 or not (status is None or 100 <= status <= 599):
+                return json_response({
+                    "error": "limit must be a non-negative integer and "
+                             "status an HTTP status code",
+                }, 400)
+
+            return json_response(access_logger.recent(limit, status))
+
+        return self.add_url_handle(route, recent_requests, authorize)
+
+    def enable_profiling(self, authorize, route="/_debug"):
+        """Adds GET routes for inspecting the application the server
+            runs in:
+
+            - route + '/threads' returns the current stack of every
+              thread.
+            - route + '/profile' samples the stacks of all threads for
+              'seconds' (default 5) at 'rate' samples per second
+              (default 100) and returns collapsed stacks for flamegraph
+              tools. Only one session runs at a time, concurrent
+              requests get a 409.
+
+            :param authorize: Authorization function, given the username
+                and password from the Authorization header. Required,
+                stack traces expose a lot about the application.
+            :param route: The URL prefix of the routes.
+            :returns: self.
+        """
+
+        from .profiler import (
+            TMCSampler,
+            ProfilerBusyError,
+            thread_dump,
+            MAX_SECONDS,
+            MAX_RATE,
+        )
+
+        plain_text = {"Content-Type": "text/plain"}
+        sampler = TMCSampler()
+
+        def threads():
+            return TMCResponse(thread_dump(), 200, plain_text)
+
+        def profile(seconds=5, rate=100):
+            try:
+                seconds, rate = float(seconds), float(rate)
+            except (TypeError, ValueError):
+                seconds = rate = 0
+
+            if not (0 < seconds <= MAX_SECONDS and 0 < rate <= MAX_RATE):
+                return TMCResponse(
+                    "seconds must be in (0, {}] and rate in (0, {}]".format(
+                        MAX_SECONDS,
+                        MAX_RATE,
+                    ),
+                    400,
+                    plain_text,
                 )
 
-            key = format_route_key(route, method)
-            if key in self.__route_rules:
-                raise AssertionError(
-                    """
-                    Invariant violation: handler already registered for
-                    route {} using method {}.
-                    """.format(route, method.upper())
+            try:
+                return TMCResponse(
+                    sampler.collapsed(seconds, rate),
+                    200,
+                    plain_text,
+                )
+
+            except ProfilerBusyError:
+                return TMCResponse(
+                    "A profiling session is already running",
+                    409,
+                    plain_text,
                 )
 
-            self.__route_rules[key] = TMCKnownRoute(handler, authorize)
+        return self.add_url_handles([
+            (route + "/threads", threads, authorize),
+            (route + "/profile", profile, authorize),
+        ])
+
+    def enable_memory_profiling(
+            self,
+            authorize,
+            route="/_debug/memory",
+            wait: float = 1.0,
+        ):
+        """Adds routes for tracing allocations with tracemalloc and
+            comparing named snapshots, all answering with JSON:
+
+            - GET route: whether tracing, traced memory and snapshots.
+            - POST route + '/start' starts tracing, with 'frames' per
+              allocation (default 1).
+            - POST route + '/stop' stops tracing, dropping snapshots.
+            - POST route + '/snapshot' stores a snapshot as 'name'.
+            - GET route + '/top' returns the top 'limit' allocation
+              sites of snapshot 'name'.
+            - GET route + '/diff' returns the top 'limit' differences
+              between snapshots 'old' and 'new'.
+            - GET route + '/result' returns the result of 'job'.
+
+            top and diff group by 'key_type', one of 'filename',
+            'lineno' (default) or 'traceback'. They are computed on a
+            background thread; if not done within 'wait' seconds, at
+            most memory.MAX_WAIT, the response is a 202 with the job
+            id to fetch from /result.
+
+            :param authorize: Authorization function, given the username
+                and password from the Authorization header. Required,
+                tracing slows down the whole application.
+            :param route: The URL prefix of the routes.
+            :param wait: Default seconds to wait for a comparison, at
+                most memory.MAX_WAIT.
+            :returns: self.
+        """
+
+        from .memory import TMCMemoryProfiler, memory_routes
+
+        return self.add_url_handles(
+            memory_routes(TMCMemoryProfiler(), route, authorize, wait)
+        )
+
+    def enable_tracing(
+            self,
+            sink=None,
+            capacity: int = 10000,
+            interval: float = 1.0,
+        ):
+        """Traces every request: the durations of its phases (parse,
+            route, authorize, unpack, handler, encode, write) are
+            measured and sent to the client in a Server-Timing header,
+            and a W3C traceparent header from the client is continued.
+            Handlers can get the trace of their request, e.g. to pass
+            its traceparent on, with tracing.current_trace. Has to be
+            called before the server is started.
+
+            :param sink: Optional callable receiving lists of
+                tracing.TMCSpan on a background thread, for export to
+                a tracing backend. Requests never wait for it.
+            :param capacity: Maximum number of spans waiting for the
+                sink, the oldest are dropped beyond that.
+            :param interval: Seconds between calls to the sink.
+            :returns: self.
+        """
+
+        if self.__serving:
+            raise AssertionError(
+                "Invariant violation: tracing must be enabled before "
+                "the server is started."
+            )
+
+        from .tracing import TMCTracer
+
+        self.__tracer = TMCTracer(sink, capacity, interval, self.__on_error)
+        if self.__tracer.drain is not None:
+            self.__add_background(self.__tracer.drain)
+
+        return self
+
+    def __add_background(self, component):
+        """Registers a component to start and stop with the server,
+            starting it right away if the server is running.
+
+            :param component: Object with start and stop methods.
+            :returns: The component.
+        """
+
+        self.__background.append(component)
+        if self.__serving:
+            component.start()
+
+        return component
+
+    @property
+    def timeseries(self):
+        """The TMCTimeSeriesStore of the server, created on first use.
+            Its metrics are sampled in the background while the server
+            runs.
+        """
+
+        if self.__timeseries is None:
+            from .timeseries import TMCTimeSeriesStore
+            self.__timeseries = self.__add_background(
+                TMCTimeSeriesStore(on_error=self.__on_error)
+            )
+
+        return self.__timeseries
+
+    def metric(self, name, **opts):
+        """Decorator for registering a function to sample into a time
+            series, see TMCTimeSeriesStore.register for the options.
+
+            :param name: The name of the metric.
+            :param opts: The gathered keyword arguments.
+            :returns: The decorator.
+        """
+
+        def decorator(func):
+            """The inner decorator function.
+
+                :param func: The sampling function to register.
+                :returns: The sampling function.
+            """
+            self.timeseries.register(name, func, **opts)
+            return func
+
+        return decorator
+
+    def enable_timeseries_route(self, route="/_timeseries", authorize=yes):
+        """Adds a GET route returning a time range of a metric as JSON,
+            downsampled to the min, max and mean of at most 'points'
+            buckets (default 100). The range is given by 'start' and
+            'end' in seconds since the epoch, or relative to now if
+            negative, e.g. start=-300 for the last five minutes.
+            Without 'name' the route lists the registered metrics.
+
+            :param route: The URL to register.
+            :param authorize: Authorization function, given the username
+                and password from the Authorization header.
+            :returns: self.
+        """
+
+        timeseries = self.timeseries
+
+        def query(name=None, start=None, end=None, points=100):
+            if name is None:
+                return json_response(sorted(timeseries.series))
+
+            try:
+                points = int(points)
+                start = None if start is None else float(start)
+                end = None if end is None else float(end)
+            except (TypeError, ValueError):
+                points = 0
+
+            if not 0 < points <= 10000:
+                return json_response({"error": "Invalid range"}, 400)
+
+            try:
+                return json_response(
+                    timeseries.query(str(name), start, end, points)
+                )
+
+            except KeyError:
+                return json_response({"error": "Unknown metric"}, 404)
+
+        return self.add_url_handle(route, query, authorize)
+
+    @property
+    def health(self):
+        """The TMCHealthRegistry of the server, created on first use.
+            Its checks run in the background while the server runs.
+        """
+
+        if self.__health is None:
+            from .health import TMCHealthRegistry
+            self.__health = self.__add_background(TMCHealthRegistry())
+
+        return self.__health
+
+    def health_check(self, name, **opts):
+        """Decorator for registering a health check, see
+            TMCHealthRegistry.register for the options.
+
+            :param name: The name to report the check under.
+            :param opts: The gathered keyword arguments.
+            :returns: The decorator.
+        """
+
+        def decorator(func):
+            """The inner decorator function.
+
+                :param func: The check to register.
+                :returns: The check.
+            """
+            self.health.register(name, func, **opts)
+            return func
+
+        return decorator
+
+    def enable_health_route(self, route="/health", authorize=yes):
+        """Adds a GET route returning the cached results of the health
+            checks as JSON, with a 503 status if a critical check is
+            failing or hasn't completed yet.
+
+            :param route: The URL to register.
+            :param authorize: Authorization function, given the username
+                and password from the Authorization header.
+            :returns: self.
+        """
+
+        health = self.health
+
+        def report():
+            return health.report
+
+        return self.add_url_handle(route, report, authorize)
+
+    @property
+    def heartbeats(self):
+        """The TMCHeartbeatRegistry of the server, created on first
+            use. Application threads beat through it, e.g. with
+            server.heartbeats.beat() once per iteration of their loop.
+        """
+
+        if self.__heartbeats is None:
+            from .heartbeat import TMCHeartbeatRegistry
+            self.__heartbeats = TMCHeartbeatRegistry()
+
+        return self.__heartbeats
+
+    def enable_heartbeat_route(self, route="/_heartbeats", authorize=yes):
+        """Adds a GET route reporting the heartbeats of the application
+            threads as JSON, with a 503 status if any of them stalled.
+
+            :param route: The URL to register.
+            :param authorize: Authorization function, given the username
+                and password from the Authorization header.
+            :returns: self.
+        """
+
+        heartbeats = self.heartbeats
+
+        def report():
+            report = heartbeats.report()
+            return json_response(
+                report,
+                503 if report["status"] == "stalled" else 200,
+            )
+
+        return self.add_url_handle(route, report, authorize)
+
+    @property
+    def route_rules(self):
+        """Read-only view of the current route table."""
+
+        return self.__routes.rules
+
+    def bulkhead_stats(self) -> dict:
+        """The gauges of the routes with a concurrency limit.
+
+            :returns: Dict mapping each such route to its
+                TMCBulkhead.stats.
+        """
+
+        return {
+            route.bulkhead.name: route.bulkhead.stats()
+            for route in self.__routes.rules.values()
+            if getattr(route, "bulkhead", None) is not None
+        }
+
+    def enable_bulkhead_route(self, route="/_bulkheads", authorize=yes):
+        """Adds a GET route returning bulkhead_stats as JSON. The route
+            itself has no concurrency limit.
+
+            :param route: The URL to register.
+            :param authorize: Authorization function, given the username
+                and password from the Authorization header.
+            :returns: self.
+        """
+
+        def stats():
+            return json_response(self.bulkhead_stats())
+
+        return self.add_url_handle(route, stats, authorize)
+
+    def add_file_route(
+            self,
+            route,
+            directory,
+            authorize=yes,
+        ):
+        """Serves the files below a directory for GET requests to
+            paths below the route, e.g. with route '/logs' a request
+            for '/logs/app.log' sends 'app.log' in that directory.
+            Nothing outside of the directory is ever served. Clients
+            can request part of a file with a Range header, e.g.
+            'Range: bytes=-4096' for the last 4KiB of a log.
+
+            :param route: The URL prefix to register.
+            :param directory: The whitelisted directory to serve.
+            :param authorize: Authorization function, given the username
+                and password from the Authorization header.
+            :returns: self.
+        """
+
+        directory = os.path.realpath(directory)
+        if not os.path.isdir(directory):
+            raise NotADirectoryError(directory)
+
+        self.__routes.update([(
+            format_route_key(file_route_prefix(route), "GET"),
+            TMCFileRoute(directory, authorize),
+        )])
 
         return self
 
@@ -430,7 +1495,7 @@ class TMCServer(Thread):
             and handles requests in an infinite loop that can be broken
             by calling TMCServer::stop.
         """
-        if not self.__route_rules:
+        if not self.__routes.rules:
             self.__on_error(AssertionError(
                 """
                 Invariant Violation: Server has no route handlers and
@@ -438,21 +1503,86 @@ class TMCServer(Thread):
                 """
             ))
         self.__serving = True
-        with TMCHTTPServer(
-                self.__route_rules,
-                self.__magic,
-                self.address,
-                self.__handler,
-                self.__on_error,
-            ) as server:
+        for component in self.__background:
+            component.start()
+
+        with ExitStack() as stack:
+            selector = stack.enter_context(selectors.DefaultSelector())
+            if self.port is not None:
+                selector.register(
+                    stack.enter_context(self.create_http_server()),
+                    selectors.EVENT_READ,
+                )
+
+            if self.unix_socket is not None:
+                selector.register(
+                    stack.enter_context(self.create_unix_http_server()),
+                    selectors.EVENT_READ,
+                )
+
             while self.__serving:
-                try:
-                    server.handle_request()
-                except Exception as err:
-                    self.__on_error(err)
+                for key, _ in selector.select(POLL_INTERVAL):
+                    try:
+                        key.fileobj.handle_request()
+                    except Exception as err:
+                        self.__on_error(err)
+
+            for component in self.__background:
+                component.stop()
 
             print("\nServer exited.\n")
 
+    def create_http_server(self, bind_and_activate: bool = True):
+        """Creates the TMCHTTPServer serving this server's routes.
+
+            :param bind_and_activate: Whether to bind and listen on
+                the server's address. Unbound servers are used to
+                dispatch requests in memory, see test_client.
+            :returns: The server.
+        """
+
+        return TMCHTTPServer(
+            self.__routes,
+            None,
+            self.address,
+            self.__handler,
+            self.__on_error,
+            self.__access_logger,
+            bind_and_activate,
+            tracer=self.__tracer,
+        )
+
+    def create_unix_http_server(self):
+        """Creates the TMCUnixHTTPServer serving this server's routes
+            on its Unix domain socket.
+
+            :returns: The server.
+        """
+
+        return TMCUnixHTTPServer(
+            self.__routes,
+            None,
+            self.unix_socket,
+            self.__handler,
+            self.__on_error,
+            self.__access_logger,
+            socket_mode=self.unix_socket_mode,
+            tracer=self.__tracer,
+        )
+
+    def test_client(self):
+        """Creates a client that sends requests through the routing,
+            authorization, parameter parsing and response encoding of
+            the request handler without any network I/O, so the
+            server doesn't need to be started. Intended for tests.
+
+            :returns: A TMCTestClient.
+        """
+
+        from .testing import TMCTestClient
+
+        return TMCTestClient(self.create_http_server(False))
+
     def stop(self):
         """Stops the HTTP server. Don't forget to call TMCServer::join
             afterwards if waiting on the thread to finish is necessary.
@@ -464,30 +1594,145 @@ class TMCServer(Thread):
 class TMCHTTPServer(ThreadingHTTPServer):
     """This is the actual HTTP server that is in turn wrapped by TMCServer.
 
-        :param rules: The route rules registered with the parent server.
-        :param magic_instance: The magic instance to check mime types against.
+        :param rules: The TMCRouteTable of the parent server, or a
+            mapping of route rules.
+        :param magic_instance: The magic instance to check mime types
+            against, defaults to the shared instance from load_magic,
+            which is only created once a mime type is guessed.
         :param address: Address tuple, defaults to quad zeros and port 8080.
         :param handler: The request handler, defaults to
             TMCRequestHandler.
         :param on_error: Because the actual HTTP server runs in
             a separate thread, the caller can pass a callback
             here to receive errors that arise during requests.
+        :param access_logger: Optional TMCAccessLogger.
+        :param bind_and_activate: Whether to bind and listen on the
+            address, if not the socket is closed right away.
+        :param tracer: Optional TMCTracer tracing every request.
     """
 
     def __init__(
             self,
             rules,
-            magic_instance,
+            magic_instance=None,
             address: ADDRESS = ("0.0.0.0", 8080),
             handler=TMCRequestHandler,
             on_error=_default_error_handler,
+            access_logger=None,
+            bind_and_activate: bool = True,
+            tracer=None,
         ):
         """Initializer for TMCHTTPServer"""
 
-        super(TMCHTTPServer, self).__init__(address, handler)
+        super(TMCHTTPServer, self).__init__(
+            address,
+            handler,
+            bind_and_activate,
+        )
+
+        if not bind_and_activate:
+            self.server_close()
 
         # These instance attributes are mostly here for the benefit of
         # the handler.
-        self.magic = magic_instance
-        self.route_rules = rules
+        self.__magic = magic_instance
+        if not isinstance(rules, TMCRouteTable):
+            rules = TMCRouteTable(rules)
+
+        self.routes = rules
         self.on_error = on_error
+        self.access_logger = access_logger
+        self.tracer = tracer
+
+    @property
+    def route_rules(self):
+        """The current route rules. Handlers should read this once
+            per request, the table may be swapped at any time.
+        """
+
+        return self.routes.rules
+
+    @property
+    def magic(self):
+        """The magic instance to check mime types against, or None
+            if libmagic is unavailable.
+        """
+
+        if self.__magic is None:
+            return load_magic()
+
+        return self.__magic
+
+
+class TMCUnixHTTPServer(TMCHTTPServer):
+    """TMCHTTPServer listening on a Unix domain stream socket. Takes the
+        same parameters, except that the address is the path of the
+        socket, and additionally:
+
+        :param socket_mode: File permissions of the socket. A stale
+            socket left at the path is replaced.
+    """
+
+    address_family = socket.AF_UNIX
+
+    def __init__(self, *args, socket_mode: int = 0o600, **kwargs):
+        """Initializer for TMCUnixHTTPServer"""
+
+        self.socket_mode = socket_mode
+        self.bound = False
+        super(TMCUnixHTTPServer, self).__init__(*args, **kwargs)
+
+    @property
+    def is_abstract(self) -> bool:
+        """Whether the socket is in the abstract namespace."""
+
+        return self.server_address.startswith(("@", "\0"))
+
+    def server_bind(self):
+        """Override of HTTPServer::server_bind, which expects a host
+            and port.
+        """
+
+        path, abstract = self.server_address, self.is_abstract
+        if abstract:
+            self.server_address = "\0" + path[1:]
+
+        elif os.path.exists(path):
+            # Left behind by a server that didn't shut down cleanly.
+            # Refuse to touch anything that isn't a socket though.
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise FileExistsError(path)
+
+            os.unlink(path)
+
+        socketserver.TCPServer.server_bind(self)
+        self.bound = True
+        if not abstract:
+            os.chmod(path, self.socket_mode)
+
+        # TCPServer::server_bind stored the name the kernel reports,
+        # which is bytes for abstract sockets.
+        self.server_address = path
+        self.server_name = path
+        self.server_port = 0
+
+    def get_request(self):
+        """Override of TCPServer::get_request, clients of Unix domain
+            sockets have no address worth mentioning but the request
+            handler expects a host and port.
+        """
+
+        connection, _ = self.socket.accept()
+        return connection, ("unix", 0)
+
+    def server_close(self):
+        """Override of TCPServer::server_close that removes the
+            socket file.
+        """
+
+        super(TMCUnixHTTPServer, self).server_close()
+        path = self.server_address
+        if self.bound and not self.is_abstract and os.path.exists(path):
+            os.unlink(path)
+
+        self.bound = False
@@ -0,0 +1,218 @@
+"""
+.. py:module:: tmc_http_server.tracing
+    :platform: *nix
+    :synopsis: Opt-in request tracing. Times the phases of each request
+        (parsing, authorization, parameter unpacking, the handler,
+        encoding, the socket write), reports them to the client in a
+        Server-Timing header and continues the W3C trace context of
+        the caller, optionally exporting the spans in the background.
+"""
+import re
+import time
+import random
+
+from collections import namedtuple
+from threading import local
+
+from .background import TMCDrain
+from .tmc_http_server import _default_error_handler
+
+# version-trace id-parent id-flags, see https://www.w3.org/TR/trace-context/
+TRACEPARENT = re.compile(
+    r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$"
+)
+
+INVALID_TRACE_ID = "0" * 32
+INVALID_SPAN_ID = "0" * 16
+
+# Flags of traces we start ourselves, sampled.
+SAMPLED = "01"
+
+TMCSpan = namedtuple('TMCSpan', [
+    'trace_id',
+    'span_id',
+    'parent_id',
+    'name',
+    'start_time',
+    'duration_ms',
+    'status',
+    'phases',
+])
+
+# The trace of the request being handled on each thread.
+_current = local()
+
+
+def current_trace():
+    """The trace of the request being handled on the calling thread,
+        e.g. for a handler to pass its traceparent on to services it
+        calls.
+
+        :returns: The TMCTrace, or None outside of traced requests.
+    """
+
+    return getattr(_current, "trace", None)
+
+
+def parse_traceparent(header: str):
+    """Parses a traceparent header.
+
+        :param header: The header value.
+        :returns: Tuple of the trace id, parent span id and flags, or
+            None if the header is invalid.
+    """
+
+    match = TRACEPARENT.match(header.strip())
+    if match is None:
+        return None
+
+    version, trace_id, parent_id, flags, rest = match.groups()
+    # Version 00 has no further fields, later versions may add some.
+    if version == "ff" or (version == "00" and rest):
+        return None
+
+    if trace_id == INVALID_TRACE_ID or parent_id == INVALID_SPAN_ID:
+        return None
+
+    return trace_id, parent_id, flags
+
+
+def new_id(bits: int) -> str:
+    """A random, non-zero trace or span id as lowercase hex."""
+
+    return "{:0{}x}".format(random.getrandbits(bits) or 1, bits // 4)
+
+
+class TMCTrace:
+    """The trace of a single request. Phases are recorded in order,
+        each lasting from the end of the previous one.
+
+        :param name: The name of the span, e.g. 'GET /status'.
+        :param traceparent: The caller's traceparent header, if any.
+        :param started: perf_counter_ns at the start of the request.
+    """
+
+    def __init__(self, name: str, traceparent: str = None,
+                 started: int = None):
+        """Initializer for TMCTrace"""
+
+        parent = parse_traceparent(traceparent) if traceparent else None
+        if parent is None:
+            self.trace_id, self.parent_id, self.flags = (
+                new_id(128), None, SAMPLED
+            )
+
+        else:
+            self.trace_id, self.parent_id, self.flags = parent
+
+        self.span_id = new_id(64)
+        self.name = name
+        self.status = None
+        self.start_time = time.time()
+        self.started = self.last = started or time.perf_counter_ns()
+        # (phase, nanoseconds) tuples.
+        self.phases = []
+
+    @property
+    def traceparent(self) -> str:
+        """traceparent header identifying this request's span, for
+            calls made while handling it.
+        """
+
+        return "00-{}-{}-{}".format(self.trace_id, self.span_id, self.flags)
+
+    def mark(self, phase: str):
+        """Ends a phase.
+
+            :param phase: The name of the phase.
+        """
+
+        now = time.perf_counter_ns()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def server_timing(self) -> str:
+        """Formats the phases so far as a Server-Timing header, with
+            the traceparent in the description of a final entry.
+        """
+
+        return ", ".join([
+            "{};dur={:.3f}".format(phase, duration / 1e6)
+            for phase, duration in self.phases
+        ] + [
+            "total;dur={:.3f}".format((self.last - self.started) / 1e6),
+            'traceparent;desc="{}"'.format(self.traceparent),
+        ])
+
+    def span(self) -> TMCSpan:
+        """The trace as a TMCSpan, durations in milliseconds."""
+
+        return TMCSpan(
+            self.trace_id,
+            self.span_id,
+            self.parent_id,
+            self.name,
+            self.start_time,
+            (self.last - self.started) / 1e6,
+            self.status,
+            {phase: duration / 1e6 for phase, duration in self.phases},
+        )
+
+
+class TMCTracer:
+    """Starts and finishes the traces of a TMCServer's requests. See
+        TMCServer.enable_tracing.
+
+        :param sink: Optional callable receiving lists of TMCSpan on a
+            background thread, e.g. to forward them to a collector.
+        :param capacity: Maximum number of spans waiting for the sink,
+            the oldest are dropped beyond that.
+        :param interval: Seconds between calls to the sink.
+        :param on_error: Callback for errors raised by the sink.
+    """
+
+    def __init__(
+            self,
+            sink=None,
+            capacity: int = 10000,
+            interval: float = 1.0,
+            on_error=_default_error_handler,
+        ):
+        """Initializer for TMCTracer"""
+
+        self.sink = sink
+        self.drain = None
+        if sink is not None:
+            # Spans are built on the background thread, request
+            # threads only queue the trace.
+            self.drain = TMCDrain(
+                lambda traces: sink([trace.span() for trace in traces]),
+                capacity,
+                interval,
+                on_error,
+                name="tmc-tracing",
+            )
+
+    def start(self, name: str, traceparent: str = None,
+              started: int = None) -> TMCTrace:
+        """Starts the trace of a request on the calling thread.
+
+            :param name: The name of the span.
+            :param traceparent: The caller's traceparent header, if any.
+            :param started: perf_counter_ns at the start of the request.
+            :returns: The TMCTrace.
+        """
+
+        trace = TMCTrace(name, traceparent, started)
+        _current.trace = trace
+        return trace
+
+    def finish(self, trace: TMCTrace):
+        """Finishes the trace of a request, queueing it for the sink.
+
+            :param trace: The trace returned by start.
+        """
+
+        _current.trace = None
+        if self.drain is not None:
+            self.drain.put(trace)